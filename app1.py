@@ -1,34 +1,15 @@
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
-from sklearn.linear_model import LinearRegression
+from gauges import gauge_panel
 import numpy as np
+from linear_forecast import make_forecast
+from batch_forecast import MODELS, batch_forecast, workbook_series
+from upload_cache import read_upload
+from kpi import calculate_kpis
+from profiling import profiler, section, profiling_panel
 
-# Fonction pour calculer les KPI
-def calculate_kpis(data, max_capacity):
-    total_time = data['Temps de Production'].sum()
-    total_production = data['Nombre de Produits Fabriqués'].sum()
-    total_downtime = data['Temps d\'Arrêt'].sum()
-    total_failures = data['Nombre de Pannes'].sum()
-
-    if total_time > 0 and max_capacity > 0:
-        production_rate = (total_production / total_time) / max_capacity * 100
-        mtbf = total_time / total_failures if total_failures > 0 else 0
-        mttr = total_downtime / total_failures if total_failures > 0 else 0
-    else:
-        production_rate = mtbf = mttr = 0
-
-    return production_rate, mtbf, mttr
-
-# Fonction pour faire une prévision
-def make_forecast(data):
-    model = LinearRegression()
-    X = np.array(data.index).reshape(-1, 1)  # Utilisation de l'index comme variable indépendante
-    y = data['Nombre de Produits Fabriqués']  # Variable dépendante
-    model.fit(X, y)  # Entraîner le modèle
-    future_index = np.array([[len(data)]])  # Index pour la prévision future
-    forecast = model.predict(future_index)  # Faire la prévision
-    return forecast[0]
+# Début de la mesure du rerun complet (seulement si le profilage est activé)
+rerun_started = profiler.start()
 
 # Interface utilisateur
 st.title("Application de suivi de performance et d'analyse prédictive")
@@ -69,74 +50,15 @@ if temps_production > 0 and nombre_produits > 0 and temps_arret > 0 and nombre_p
     objective_mtbf = temps_production
     objective_mttr = 2  # Objectif pour le MTTR
 
-    # Graphique Thermomètre pour le Taux de Production
-    st.header("Thermometer Chart for Production Rate")
-    fig_production_rate = go.Figure()
-    fig_production_rate.add_trace(go.Indicator(
-        mode="gauge+number",
-        value=production_rate,
-        gauge=dict(
-            axis=dict(range=[0, objective_production_rate]),
-            bar=dict(color="lightblue"),
-            steps=[
-                {"range": [0, production_rate], "color": "green"},
-                {"range": [production_rate, objective_production_rate], "color": "red"}
-            ],
-            threshold=dict(
-                line=dict(color="red", width=4),
-                thickness=0.75,
-                value=production_rate
-            )
-        ),
-        title={"text": "Production rate (%)"}
-    ))
-    st.plotly_chart(fig_production_rate)
-
-    # Graphique Thermomètre pour MTBF
-    st.header("Thermometer Chart for the MTBF")
-    fig_mtbf = go.Figure()
-    fig_mtbf.add_trace(go.Indicator(
-        mode="gauge+number",
-        value=mtbf,
-        gauge=dict(
-            axis=dict(range=[0, objective_mtbf]),
-            bar=dict(color="lightblue"),
-            steps=[
-                {"range": [0, mtbf], "color": "green"},
-                {"range": [mtbf, objective_mtbf], "color": "red"}
-            ],
-            threshold=dict(
-                line=dict(color="red", width=4),
-                thickness=0.75,
-                value=mtbf
-            )
-        ),
-        title={"text": "Mean time between failure"}
-    ))
-    st.plotly_chart(fig_mtbf)
-
-    # Graphique Thermomètre pour MTTR
-    st.header("Thermometer Chart for the MTTR")
-    fig_mttr = go.Figure()
-    fig_mttr.add_trace(go.Indicator(
-        mode="gauge+number",
-        value=mttr,
-        gauge=dict(
-            axis=dict(range=[0, objective_mttr]),
-            bar=dict(color="lightblue"),
-            steps=[
-                {"range": [0, mtbf], "color": "green"},
-                {"range": [mttr, 2], "color": "red"}
-            ],
-            threshold=dict(
-                line=dict(color="red", width=4),
-                thickness=0.75,
-                value=mttr
-            )
-        ),
-        title={"text": "Mean time to repair"}
-    ))
-    st.plotly_chart(fig_mttr)
+    # Graphiques Thermomètres : les trois KPI dans une seule figure, mémorisée sur les valeurs et objectifs
+    st.header("Key performance indicators")
+    with section('app1.plotly_chart'):
+        st.plotly_chart(gauge_panel(
+            (production_rate, mtbf, mttr),
+            (objective_production_rate, objective_mtbf, objective_mttr),
+            ("Production rate (%)", "Mean time between failure", "Mean time to repair"),
+            bar_color="lightblue",
+        ), width="stretch")
 else:
     st.write("Please complete all fields to view results and graphs.")
 
@@ -145,7 +67,31 @@ uploaded_file = st.file_uploader("Choose an Excel file to make a forecast", type
 
 # Bouton pour faire la prévision
 if uploaded_file:
-    data_forecast = pd.read_excel(uploaded_file)
+    data_forecast = read_upload(uploaded_file)
     if st.button("Predict"):
-        forecast = make_forecast(data_forecast)
+        forecast, lower, upper = make_forecast(data_forecast)
         st.write(f"The forecast for the number of products produced is: {forecast:.2f}")
+        if not np.isnan(lower):
+            st.write(f"95% prediction interval: [{lower:.2f}, {upper:.2f}]")
+
+# Prévision par lot : toutes les feuilles (ou colonnes par machine) d'un classeur, entraînées en parallèle
+st.header("Batch forecast")
+workbook = st.file_uploader("Choose a workbook with one sheet or column group per machine", type="xlsx",
+                            key="batch_workbook")
+if workbook:
+    col_model, col_periods = st.columns(2)
+    model = col_model.radio("Model", list(MODELS), format_func=MODELS.get, horizontal=True)
+    periods = col_periods.number_input("Horizon (periods ahead)", min_value=1, value=1)
+    if st.button("Forecast all series"):
+        with st.spinner("Forecasting..."):
+            forecast_table, elapsed = batch_forecast(workbook_series(workbook), model, int(periods))
+        st.dataframe(forecast_table, hide_index=True)
+        st.caption(f"{len(forecast_table)} series in {elapsed:.2f} s "
+                   f"({len(forecast_table) / elapsed if elapsed > 0 else 0:,.1f} series/s)")
+        failed = forecast_table['Erreur'].notna().sum()
+        if failed:
+            st.warning(f"{failed} series could not be forecast.")
+
+# Panneau de profilage (temps par section, percentiles, export Prometheus)
+profiler.stop('app1.rerun', rerun_started)
+profiling_panel(st.sidebar)
@@ -1,18 +1,19 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import matplotlib.pyplot as plt
+from histogram import normal_sample, normal_histogram, rebin, plot_histogram
 
-# Générer des données normales
-data = np.random.normal(size=100)
+# Générer des données normales (échantillon mis en cache, même graine à chaque rerun)
+data = normal_sample(100)
 data = pd.DataFrame(data, columns=["distnorm"])
 
 # Afficher les premières lignes du DataFrame
 st.write(data.head())
 
-# Créer un histogramme
+# Créer un histogramme (recalculé à partir de l'histogramme fin en cache, 10 classes comme ax.hist)
+counts, edges = rebin(*normal_histogram(100), 10)
 fig, ax = plt.subplots()
-ax.hist(data["distnorm"])
+plot_histogram(ax, counts, edges)
 
 # Afficher le graphique avec Streamlit
 st.pyplot(fig)
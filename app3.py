@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import matplotlib.pyplot as plt
+from histogram import normal_head, normal_histogram, rebin, plot_histogram
 
 st.title("Application de distribution normale")
 st.subheader("Auteur :mohammed")
@@ -9,8 +9,12 @@ st.write(
     ("cette application montre l'histogramme d'une disttribution normame")
 )
 
-# Générer des données normales
-data = np.random.normal(size=100)
+# Taille et graine de l'échantillon : les grands échantillons sont générés et comptés par blocs
+sample_size = st.selectbox('Taille de l\'échantillon', [100, 10_000, 1_000_000, 100_000_000], index=0)
+seed = st.number_input('Graine', min_value=0, value=0)
+
+# Générer des données normales (seules les premières lignes sont conservées pour l'aperçu)
+data = normal_head(5, int(seed))
 data = pd.DataFrame(data, columns=["distnorm"])
 
 # Afficher les premières lignes du DataFrame
@@ -20,12 +24,15 @@ st.write(data.head())
 num_bins = st.number_input('Select number of bins', min_value=5, max_value=50, value=20)
 
 # Créer un histogramme avec le nombre de bins spécifié par l'utilisateur
+# (recalculé à partir de l'histogramme fin en cache, sans régénérer les données)
+with st.spinner("Calcul de l'histogramme..."):
+    fine_counts, fine_edges = normal_histogram(int(sample_size), int(seed))
+counts, edges = rebin(fine_counts, fine_edges, int(num_bins))
 fig, ax = plt.subplots()
-ax.hist(data["distnorm"], bins=num_bins)  # Utiliser le nombre de bins spécifié par l'utilisateur
+plot_histogram(ax, counts, edges)
 
 # Afficher le graphique avec Streamlit
-st.pyplot(fig)
 titre = st.text_input(label="entrer")
-plt.title(titre)
+ax.set_title(titre)
 
 st.pyplot(fig)
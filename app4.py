@@ -1,10 +1,24 @@
 import streamlit as st 
 import pandas as pd 
 import numpy as np 
+from downsample import DEFAULT_TARGET_POINTS, METHODS, line_chart
 
 st.title("mohammed")
 st.subheader("auteur : mohammed")
 st.markdown("***cette application est benefique***")
 
-randomdata = np.random.normal(size = 100)
-st.line_chart(randomdata)
+
+# Série aléatoire générée une seule fois par (taille, graine), et non à chaque rerun
+@st.cache_resource
+def random_series(size, seed=0):
+    return np.random.default_rng(seed).normal(size=size)
+
+
+size = st.selectbox('Nombre de points', [100, 100_000, 1_000_000, 10_000_000], index=0)
+randomdata = random_series(size)
+
+# Réduction avant affichage : le navigateur reçoit au plus target_points points, quelle que soit la taille
+target_points = st.slider('Points affichés', min_value=100, max_value=10_000, value=DEFAULT_TARGET_POINTS, step=100)
+method = st.radio('Méthode de réduction', list(METHODS), format_func=METHODS.get, horizontal=True)
+zoom = st.slider('Zoom', min_value=0, max_value=size, value=(0, size))
+line_chart(st, randomdata, target_points, method, zoom, key=('app4', size))
@@ -1,22 +1,10 @@
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
-
-# Fonction pour calculer les KPI
-def calculate_kpis(data):
-    total_time = data['Temps de Production'].sum()
-    total_production = data['Nombre de Produits Fabriqués'].sum()
-    total_downtime = data['Temps d\'Arrêt'].sum()
-    total_failures = data['Nombre de Pannes'].sum()
-
-    if total_time > 0:
-        production_rate = (total_production / total_time) * 100
-        mtbf = total_time / total_failures if total_failures > 0 else 0
-        mttr = total_downtime / total_failures if total_failures > 0 else 0
-    else:
-        production_rate = mtbf = mttr = 0
-
-    return production_rate, mtbf, mttr
+from gauges import gauge_panel
+from kpi import calculate_kpis, TIME, PRODUCTION
+from storage import get_delta
+from upload_cache import read_upload
+from reliability import machine_reliability, MACHINE, TIMESTAMP, EVENT
 
 # Interface utilisateur
 st.title("Tableau de Bord de Performance en Temps Réel")
@@ -40,7 +28,7 @@ data = pd.DataFrame({
 })
 
 # Calcul des KPI
-production_rate, mtbf, mttr = calculate_kpis(data)
+production_rate, mtbf, mttr = calculate_kpis(data)  # Taux non rapporté à une capacité maximale
 
 # Affichage des résultats
 st.header("Résultats de Performance")
@@ -53,74 +41,63 @@ objective_production_rate = 100
 objective_mtbf = temps_production
 objective_mttr = 10  # Exemple d'objectif pour le MTTR
 
-# Graphique Thermomètre pour le Taux de Production
-st.header("Graphique Thermomètre pour le Taux de Production")
-fig_production_rate = go.Figure()
-fig_production_rate.add_trace(go.Indicator(
-    mode="gauge+number",
-    value=production_rate,
-    gauge=dict(
-        axis=dict(range=[0, objective_production_rate]),
-        bar=dict(color="lightblue"),
-        steps=[
-            {"range": [0, production_rate], "color": "green"},
-            {"range": [production_rate, objective_production_rate], "color": "red"}
-        ],
-        threshold=dict(
-            line=dict(color="red", width=4),
-            thickness=0.75,
-            value=production_rate
-        )
-    ),
-    title={"text": "Taux de Production (%)"}
-))
-st.plotly_chart(fig_production_rate)
-
-# Graphique Thermomètre pour MTBF
-st.header("Graphique Thermomètre pour MTBF")
-fig_mtbf = go.Figure()
-fig_mtbf.add_trace(go.Indicator(
-    mode="gauge+number",
-    value=mtbf,
-    gauge=dict(
-        axis=dict(range=[0, objective_mtbf]),
-        bar=dict(color="lightblue"),
-        steps=[
-            {"range": [0, mtbf], "color": "green"},
-            {"range": [mtbf, objective_mtbf], "color": "red"}
-        ],
-        threshold=dict(
-            line=dict(color="red", width=4),
-            thickness=0.75,
-            value=mtbf
-        )
-    ),
-    title={"text": "Temps Moyen Entre Pannes (MTBF) (heures)"}
-))
-st.plotly_chart(fig_mtbf)
-
-# Graphique Thermomètre pour MTTR
-st.header("Graphique Thermomètre pour MTTR")
-fig_mttr = go.Figure()
-fig_mttr.add_trace(go.Indicator(
-    mode="gauge+number",
-    value=mttr,
-    gauge=dict(
-        axis=dict(range=[0, objective_mttr]),
-        bar=dict(color="lightblue"),
-        steps=[
-            {"range": [0, mttr], "color": "green"},
-            {"range": [mttr, objective_mttr], "color": "red"}
-        ],
-        threshold=dict(
-            line=dict(color="red", width=4),
-            thickness=0.75,
-            value=mttr
-        )
-    ),
-    title={"text": "Temps Moyen de Réparation (MTTR) (heures)"}
-))
-st.plotly_chart(fig_mttr)
+# Graphiques Thermomètres : les trois KPI dans une seule figure, mémorisée sur les valeurs et objectifs
+st.header("Graphiques Thermomètres des KPI")
+st.plotly_chart(gauge_panel(
+    (production_rate, mtbf, mttr),
+    (objective_production_rate, objective_mtbf, objective_mttr),
+    ("Taux de Production (%)", "Temps Moyen Entre Pannes (MTBF) (heures)",
+     "Temps Moyen de Réparation (MTTR) (heures)"),
+    bar_color="lightblue",
+), width="stretch")
+
+# KPI calculés à partir d'un journal brut de pannes et réparations (une ligne par événement)
+st.header("Journal des Pannes")
+event_file = st.file_uploader(f"Journal d'événements (colonnes {MACHINE}, {TIMESTAMP}, {EVENT})", type=["xlsx", "csv"])
+if event_file:
+    events = read_upload(event_file)
+    missing = [column for column in (MACHINE, TIMESTAMP, EVENT) if column not in events.columns]
+    if missing:
+        st.error(f"Colonnes manquantes : {', '.join(missing)}")
+    else:
+        reliability = machine_reliability(events)
+        _, log_mtbf, log_mttr = calculate_kpis(reliability)
+        st.write(f"**Temps Moyen Entre Pannes (MTBF):** {log_mtbf:.2f} heures")
+        st.write(f"**Temps Moyen de Réparation (MTTR):** {log_mttr:.2f} heures")
+        st.dataframe(reliability.drop(columns=['Nombre de Produits Fabriqués', 'Taux de Production']))
+
+# Flux temps réel : événements machine écrits en base par le service d'ingestion (python ingest.py serve)
+# Le fragment se relance seul ; seules les lignes ajoutées depuis le dernier rafraîchissement sont lues
+st.header("Flux des Machines en Temps Réel")
+refresh_interval = st.number_input("Rafraîchissement (en secondes)", min_value=1, value=2)
+
+
+@st.fragment(run_every=refresh_interval)
+def live_dashboard():
+    if 'live_sums' not in st.session_state:
+        # Premier affichage : totaux cumulés et dernier identifiant, lus dans le même instantané
+        st.session_state.live_sums, st.session_state.live_last_id = get_delta()
+        delta_rows = 0
+    else:
+        delta, st.session_state.live_last_id = get_delta(st.session_state.live_last_id)
+        for column, value in delta.items():
+            st.session_state.live_sums[column] += value
+        delta_rows = delta['Nombre de Lignes']
+
+    sums = st.session_state.live_sums
+    live_rate, live_mtbf, live_mttr = calculate_kpis(sums)
+    st.write(f"**Lignes enregistrées :** {sums['Nombre de Lignes']} (+{delta_rows} depuis le dernier rafraîchissement)")
+    st.write(f"**Produits fabriqués :** {sums[PRODUCTION]:.0f}")
+    st.plotly_chart(gauge_panel(
+        (live_rate, live_mtbf, live_mttr),
+        (objective_production_rate, max(sums[TIME], 1), objective_mttr),
+        ("Taux de Production (%)", "Temps Moyen Entre Pannes (MTBF) (heures)",
+         "Temps Moyen de Réparation (MTTR) (heures)"),
+        bar_color="lightblue",
+    ), width="stretch")
+
+
+live_dashboard()
 
 # Interface pour Prévisions (simple exemple)
 st.header("Prévisions")
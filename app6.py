@@ -1,43 +1,36 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
+from stock_ledger import FIFO, LIFO
+from stock_store import PersistentLedger, STOCK_DB_PATH
+from profiling import profiler, section, timed, profiling_panel
 
-# Data structures to store inventory data
-stock_data = []
+# Start of the full-rerun measurement (only when profiling is enabled)
+rerun_started = profiler.start()
+
+# Inventory ledger shared across reruns, persisted as an append-only movement log (see stock_store.py)
+@st.cache_resource
+def get_store():
+    return PersistentLedger(STOCK_DB_PATH)
+
+store = get_store()
+ledger = store.ledger
 
 # Functions to manage stock
+@timed('app6.add_stock')
 def add_stock(item, quantity, cost, date):
-    stock_data.append({'Item': item, 'Quantity': quantity, 'Cost': cost, 'Date': date})
-
-def remove_stock(item, quantity, date):
-    global stock_data
-    for record in stock_data:
-        if record['Item'] == item and record['Quantity'] >= quantity:
-            record['Quantity'] -= quantity
-            if record['Quantity'] == 0:
-                stock_data.remove(record)
-            break
+    store.add(item, quantity, cost, date)
 
-# Functions to calculate stock valuation
-def calculate_fifo():
-    fifo_value = 0
-    for record in stock_data:
-        fifo_value += record['Quantity'] * record['Cost']
-    return fifo_value
+@timed('app6.remove_stock')
+def remove_stock(item, quantity, date, method=FIFO):
+    return store.issue(item, quantity, date, method)
 
-def calculate_lifo():
-    lifo_value = 0
-    for record in reversed(stock_data):
-        lifo_value += record['Quantity'] * record['Cost']
-    return lifo_value
+# Functions to calculate stock valuation (constant-time reads of the ledger's running totals)
+# Issues consume FIFO or LIFO as chosen for each issue, so the remaining lots have a single value
+def calculate_lots_value():
+    return ledger.value()
 
 def calculate_cump():
-    total_quantity = sum([record['Quantity'] for record in stock_data])
-    total_cost = sum([record['Quantity'] * record['Cost'] for record in stock_data])
-    if total_quantity == 0:
-        return 0
-    cump_value = total_cost / total_quantity
-    return cump_value * total_quantity
+    return ledger.cump_value()
 
 # Streamlit interface
 st.title("Gestion de Stock en Temps Réel")
@@ -49,28 +42,51 @@ quantity = st.number_input("Quantité", min_value=0)
 cost = st.number_input("Coût unitaire", min_value=0.0)
 date = st.date_input("Date d'ajout")
 if st.button("Ajouter"):
-    add_stock(item, quantity, cost, date)
-    st.success(f"Article {item} ajouté au stock.")
+    try:
+        add_stock(item, quantity, cost, date)
+    except ValueError as error:
+        st.error(str(error))
+    else:
+        st.success(f"Article {item} ajouté au stock.")
 
 # Remove stock form
 st.header("Sortir un article du stock")
 item = st.text_input("Nom de l'article à sortir")
 quantity = st.number_input("Quantité à sortir", min_value=0)
 date = st.date_input("Date de sortie")
+method = st.radio("Méthode de sortie", [FIFO, LIFO], horizontal=True)
 if st.button("Sortir"):
-    remove_stock(item, quantity, date)
-    st.success(f"Article {item} sorti du stock.")
+    try:
+        consumed = remove_stock(item, quantity, date, method)
+    except ValueError as error:
+        st.error(str(error))
+    else:
+        st.success(f"Article {item} sorti du stock ({len(consumed)} lot(s) consommé(s)).")
 
 # Display stock valuation
 st.header("Valorisation du stock")
-fifo_value = calculate_fifo()
-lifo_value = calculate_lifo()
+lots_value = calculate_lots_value()
 cump_value = calculate_cump()
 
-st.write(f"Valorisation FIFO: {fifo_value}")
-st.write(f"Valorisation LIFO: {lifo_value}")
+st.write(f"Valeur des lots restants (sorties FIFO/LIFO): {lots_value}")
 st.write(f"Valorisation CUMP: {cump_value}")
+with section('app6.summary'):
+    st.write(pd.DataFrame(ledger.summary()))
+
+# Reconcile the running totals against a full recompute of the lots
+if st.button("Vérifier la valorisation"):
+    with section('app6.reconcile'):
+        mismatches = ledger.reconcile()
+    if mismatches:
+        st.warning(f"Totaux corrigés : {mismatches}")
+    else:
+        st.success("Les totaux de valorisation sont cohérents avec les lots.")
 
 # Display stock data
 st.header("Données de stock")
-st.write(pd.DataFrame(stock_data))
+with section('app6.records'):
+    st.write(pd.DataFrame(ledger.records()))
+
+# Profiling panel (per-section latency percentiles, Prometheus export)
+profiler.stop('app6.rerun', rerun_started)
+profiling_panel(st.sidebar)
@@ -0,0 +1,117 @@
+import time
+import numpy as np
+import pandas as pd
+from forecast_jobs import forecast_jobs, prepare_prophet_data, prophet_forecast
+from kpi import PRODUCTION
+from linear_forecast import forecast_linear
+from model_cache import forecast_cache, make_key
+from profiling import timed
+from upload_cache import read_upload_sheets
+
+MODELS = {'linear': 'Régression linéaire', 'prophet': 'Prophet'}
+# En dessous de ce nombre total de points, les régressions linéaires sont plus rapides dans le processus
+# courant que l'envoi des séries au pool (Prophet passe toujours par le pool)
+PARALLEL_MIN_POINTS = 1_000_000
+FORECAST_COLUMNS = ['Série', 'Points', 'Prévision', 'Borne basse', 'Borne haute', 'Durée (ms)', 'Erreur']
+
+
+# Fonction pour lire toutes les séries d'un classeur : une par feuille et par colonne de production
+# (« Nombre de Produits Fabriqués », ou une colonne par machine dont le nom le contient)
+# Renvoie un dictionnaire nom -> (dates, valeurs)
+def workbook_series(uploaded_file):
+    if hasattr(uploaded_file, 'seek'):
+        uploaded_file.seek(0)
+    series = {}
+    for sheet, data in read_upload_sheets(uploaded_file).items():
+        columns = [column for column in data.columns if PRODUCTION in str(column)]
+        for column in columns:
+            name = sheet if len(columns) == 1 else f"{sheet} / {column}"
+            series[name] = prepare_prophet_data(data, column)
+    return series
+
+
+# Fonction exécutée dans un processus du pool : entraîne un modèle sur une série et mesure sa durée
+def fit_series(item):
+    model, name, ds, y, periods = item
+    start = time.perf_counter()
+    row = {'Série': name, 'Points': len(y), 'Prévision': np.nan, 'Borne basse': np.nan, 'Borne haute': np.nan,
+           'Erreur': None}
+    try:
+        if model == 'prophet':
+            row['Prévision'] = prophet_forecast(ds, y, periods)
+        else:
+            result = forecast_linear(np.asarray(y, dtype=float)[None, :], horizons=(periods,))
+            row['Prévision'] = result['forecast'][0, 0]
+            row['Borne basse'] = result['lower'][0, 0]
+            row['Borne haute'] = result['upper'][0, 0]
+    except Exception as error:
+        row['Erreur'] = f"{type(error).__name__}: {error}"
+    row['Durée (ms)'] = (time.perf_counter() - start) * 1000
+    return row
+
+
+# Fonction pour prévoir toutes les séries d'un coup ; les entraînements sont répartis dans le pool
+# de processus partagé et les prévisions déjà calculées sont reprises du cache
+# Renvoie (tableau consolidé, durée totale en secondes)
+@timed('batch_forecast.batch_forecast')
+def batch_forecast(series, model='linear', periods=1, parallel=None, jobs=None):
+    jobs = jobs or forecast_jobs
+    start = time.perf_counter()
+    rows, pending, keys = {}, [], {}
+    for name, (ds, y) in series.items():
+        key = make_key(ds, y, model=model, periods=periods, batch=True)
+        cached = forecast_cache.get(key)
+        if cached is not None:
+            rows[name] = {**cached, 'Série': name, 'Durée (ms)': 0.0}
+        else:
+            keys[name] = key
+            pending.append((model, name, ds, y, periods))
+
+    if parallel is None:
+        parallel = model != 'linear' or sum(len(item[3]) for item in pending) >= PARALLEL_MIN_POINTS
+    if parallel and len(pending) > 1 and jobs.max_workers > 1:
+        # Plusieurs séries par envoi quand elles sont nombreuses (moins d'échanges entre processus)
+        chunksize = max(1, len(pending) // (4 * jobs.max_workers))
+        fitted = jobs.map(fit_series, pending, chunksize=chunksize)
+    else:
+        fitted = [fit_series(item) for item in pending]
+
+    for row in fitted:
+        rows[row['Série']] = row
+        if row['Erreur'] is None:
+            forecast_cache.put(keys[row['Série']], row)
+    table = pd.DataFrame([rows[name] for name in series], columns=FORECAST_COLUMNS)
+    return table, time.perf_counter() - start
+
+
+# Test de montée en charge : débit (séries/s) selon le nombre de processus
+if __name__ == '__main__':
+    import argparse
+    import os
+    from forecast_jobs import JobQueue
+
+    parser = argparse.ArgumentParser(description="Prévisions par lot : débit selon le nombre de processus")
+    parser.add_argument('--series', type=int, default=48)
+    parser.add_argument('--points', type=float, default=200_000)
+    parser.add_argument('--model', choices=list(MODELS), default='linear')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    points = int(args.points)
+    series = {f"Machine {n}": (pd.Series(pd.date_range('2020-01-01', periods=points, freq='h')),
+                               pd.Series(rng.normal(100, 10, points).cumsum()))
+              for n in range(args.series)}
+    workers = 1
+    baseline = None
+    while workers <= max(os.cpu_count() or 1, 2):
+        jobs = JobQueue(workers)
+        forecast_cache.clear()
+        jobs.map(abs, range(workers))  # Démarrage des processus hors mesure
+        table, elapsed = batch_forecast(series, args.model, parallel=True, jobs=jobs)
+        jobs.shutdown()
+        throughput = len(series) / elapsed
+        baseline = baseline or throughput
+        print(f"{workers:3} processus : {elapsed:6.2f} s, {throughput:8.1f} séries/s (x{throughput / baseline:.2f}), "
+              f"médiane par série {table['Durée (ms)'].median():.1f} ms")
+        workers *= 2
+    print(table.head())
@@ -0,0 +1,116 @@
+import argparse
+import os
+import sys
+import time
+import pandas as pd
+from forecast_jobs import JobQueue, DEFAULT_MAX_WORKERS
+from kpi import calculate_kpis, SUM_COLUMNS, KPI_COLUMNS
+from upload_cache import read_csv
+
+# Extensions des fichiers de production traités
+EXTENSIONS = ('.xlsx', '.csv')
+REPORT_COLUMNS = (['Fichier', 'Lignes'] + KPI_COLUMNS
+                  + ['Prévision', 'Borne basse', 'Borne haute', 'Prévision Prophet', 'Durée (s)', 'Erreur'])
+
+
+# Fonction pour lister les fichiers de production d'un répertoire (sous-répertoires compris), triés
+def find_files(directory, recursive=True):
+    paths = []
+    for root, dirs, names in os.walk(directory):
+        paths += [os.path.join(root, name) for name in names
+                  if name.lower().endswith(EXTENSIONS) and not name.startswith('~$')]
+        if not recursive:
+            break
+    return sorted(paths)
+
+
+# Fonction pour lire un fichier de production (mêmes options que les applications)
+def read_file(path):
+    if path.lower().endswith('.csv'):
+        return read_csv(path)
+    return pd.read_excel(path)
+
+
+# Fonction exécutée dans un processus du pool : KPI et prévisions d'un fichier
+# Les erreurs sont renvoyées dans la ligne du rapport, pour ne pas interrompre le lot
+def process_file(item):
+    path, max_capacity, prophet = item
+    from linear_forecast import make_forecast
+    start = time.perf_counter()
+    row = {'Fichier': path, 'Lignes': 0, 'Erreur': None}
+    try:
+        data = read_file(path)
+        missing = [column for column in SUM_COLUMNS if column not in data.columns]
+        if missing:
+            raise KeyError(f"colonnes manquantes : {', '.join(missing)}")
+        row['Lignes'] = len(data)
+        row.update(zip(KPI_COLUMNS, calculate_kpis(data, max_capacity)))
+        row['Prévision'], row['Borne basse'], row['Borne haute'] = (float(value) for value in make_forecast(data))
+        if prophet:
+            from forecast_jobs import make_advanced_forecast
+            row['Prévision Prophet'] = make_advanced_forecast(data)
+    except Exception as error:
+        row['Erreur'] = f"{type(error).__name__}: {error}"
+    row['Durée (s)'] = time.perf_counter() - start
+    return row
+
+
+# Fonction pour traiter tous les fichiers dans un pool de processus ; renvoie (rapport, durée totale)
+def build_report(paths, max_capacity=None, prophet=False, workers=DEFAULT_MAX_WORKERS):
+    start = time.perf_counter()
+    items = [(path, max_capacity, prophet) for path in paths]
+    if workers > 1 and len(items) > 1:
+        jobs = JobQueue(workers)
+        try:
+            # Plusieurs fichiers par envoi quand ils sont nombreux (moins d'échanges entre processus)
+            rows = jobs.map(process_file, items, chunksize=max(1, len(items) // (8 * workers)))
+        finally:
+            jobs.shutdown()
+    else:
+        rows = [process_file(item) for item in items]
+    report = pd.DataFrame(rows, columns=REPORT_COLUMNS)
+    if not prophet:
+        report = report.drop(columns='Prévision Prophet')
+    return report, time.perf_counter() - start
+
+
+# Fonction pour écrire le rapport consolidé (Parquet ou CSV selon l'extension)
+def write_report(report, output):
+    if output.lower().endswith('.parquet'):
+        report.to_parquet(output, index=False)
+    else:
+        report.to_csv(output, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rapport KPI et prévisions de tous les fichiers de production "
+                                                 "(XLSX/CSV) d'un répertoire, sans interface")
+    parser.add_argument('directory')
+    parser.add_argument('-o', '--output', default='rapport.parquet', help="rapport consolidé (.parquet ou .csv)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_MAX_WORKERS)
+    parser.add_argument('--max-capacity', type=float, default=None,
+                        help="capacité de production maximale (taux de production rapporté à cette capacité)")
+    parser.add_argument('--prophet', action='store_true', help="ajouter la prévision Prophet (plus lente)")
+    parser.add_argument('--no-recursive', action='store_true', help="ne pas parcourir les sous-répertoires")
+    args = parser.parse_args(argv)
+
+    paths = find_files(args.directory, recursive=not args.no_recursive)
+    if not paths:
+        print(f"Aucun fichier {'/'.join(EXTENSIONS)} dans {args.directory}")
+        return 1
+    report, elapsed = build_report(paths, args.max_capacity, args.prophet, args.workers)
+    write_report(report, args.output)
+
+    failed = report['Erreur'].notna()
+    print(f"{len(paths)} fichiers, {report['Lignes'].sum():,} lignes en {elapsed:.2f} s avec {args.workers} processus "
+          f"({len(paths) / elapsed:,.1f} fichiers/s, {report['Lignes'].sum() / elapsed:,.0f} lignes/s)")
+    print(f"Durée par fichier : médiane {report['Durée (s)'].median() * 1000:.1f} ms, "
+          f"max {report['Durée (s)'].max() * 1000:.1f} ms")
+    for _, row in report[failed].iterrows():
+        print(f"ÉCHEC {row['Fichier']} : {row['Erreur']}")
+    print(f"Rapport écrit dans {args.output}")
+    return 1 if failed.any() else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
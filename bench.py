@@ -0,0 +1,362 @@
+import argparse
+import ast
+import atexit
+import datetime
+import gc
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+# Tailles par défaut des jeux de données synthétiques (--sizes pour aller jusqu'à 10^7)
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+# Seuils par défaut de la comparaison : +20 % de temps, +20 % de mémoire
+DEFAULT_TIME_THRESHOLD = 0.20
+DEFAULT_MEMORY_THRESHOLD = 0.20
+# Écarts absolus minimaux pour signaler une régression (les cas de quelques microsecondes ou de quelques
+# kilo-octets varient de plus de 20 % d'une exécution à l'autre) : 0,1 ms et 64 Kio
+DEFAULT_MIN_TIME_DELTA = 1e-4
+DEFAULT_MIN_MEMORY_DELTA = 64 * 1024
+# Répertoire des applications (les chemins relatifs des applications sont résolus par rapport à lui)
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+# Applications mesurées au démarrage, et budget par défaut du premier chargement (en secondes)
+APPS = ['app1.py', 'app2.py', 'app3.py', 'app4.py', 'app5.py', 'app6.py', 'test.py']
+DEFAULT_STARTUP_BUDGET = 0.5
+
+# Registre des benchmarks : nom -> (préparation, taille maximale)
+# La préparation reçoit la taille et renvoie la fonction à chronométrer (la préparation n'est pas mesurée)
+BENCHMARKS = {}
+
+
+def benchmark(name, max_size=None):
+    def register(setup):
+        BENCHMARKS[name] = (setup, max_size)
+        return setup
+    return register
+
+
+# Fonction pour générer des données de production synthétiques
+def production_frame(size, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Temps de Production': rng.uniform(1, 8, size),
+        'Nombre de Produits Fabriqués': rng.integers(0, 500, size),
+        'Temps d\'Arrêt': rng.uniform(0, 1, size),
+        'Nombre de Pannes': rng.integers(0, 3, size),
+        'Machine': rng.integers(0, 100, size),
+    })
+
+
+@benchmark('kpi.calculate_kpis')
+def bench_calculate_kpis(size):
+    from kpi import calculate_kpis
+    data = production_frame(size)
+    return lambda: calculate_kpis(data, 100)
+
+
+@benchmark('kpi.calculate_kpis_by_group')
+def bench_calculate_kpis_by_group(size):
+    from kpi import calculate_kpis_by_group
+    data = production_frame(size)
+    return lambda: calculate_kpis_by_group(data, 'Machine', 100)
+
+
+@benchmark('linear_forecast.make_forecast')
+def bench_make_forecast(size):
+    from linear_forecast import make_forecast
+    data = production_frame(size)
+    return lambda: make_forecast(data)
+
+
+# Prophet est lent : limité aux petites séries, ignoré s'il n'est pas installé
+@benchmark('forecast_jobs.make_advanced_forecast', max_size=10_000)
+def bench_make_advanced_forecast(size):
+    import fbprophet  # noqa: F401
+    from forecast_jobs import make_advanced_forecast
+    from model_cache import forecast_cache
+    data = production_frame(size)
+
+    def run():
+        forecast_cache.clear()
+        make_advanced_forecast(data.copy())
+    return run
+
+
+# MTBF / MTTR par machine à partir d'un journal brut de pannes et réparations
+@benchmark('reliability.machine_reliability')
+def bench_machine_reliability(size):
+    from reliability import machine_reliability, synthetic_events
+    events = synthetic_events(size)
+    return lambda: machine_reliability(events)
+
+
+# Mouvements de stock aléatoires (size entrées puis size / 2 sorties)
+@benchmark('stock_ledger.add_issue')
+def bench_stock_movements(size):
+    from stock_ledger import StockLedger, FIFO, LIFO
+    rng = np.random.default_rng(0)
+    items = [f"article-{n}" for n in rng.integers(0, 1000, size).tolist()]
+    quantities = rng.integers(1, 100, size).tolist()
+    costs = rng.uniform(1, 50, size).tolist()
+
+    def run():
+        ledger = StockLedger()
+        for item, quantity, cost in zip(items, quantities, costs):
+            ledger.add(item, quantity, cost)
+        for n, item in enumerate(items[:size // 2]):
+            quantity = min(quantities[n], ledger.quantity(item))
+            if quantity > 0:
+                ledger.issue(item, quantity, method=FIFO if n % 2 else LIFO)
+    return run
+
+
+# Valorisations affichées par app6 : valeur des lots restants et CUMP (lectures des totaux du registre)
+@benchmark('stock_ledger.valuation')
+def bench_stock_valuation(size):
+    from stock_ledger import StockLedger
+    rng = np.random.default_rng(0)
+    ledger = StockLedger()
+    for item, quantity, cost in zip(rng.integers(0, 1000, size).tolist(), rng.integers(1, 100, size).tolist(),
+                                    rng.uniform(1, 50, size).tolist()):
+        ledger.add(item, quantity, cost)
+    return lambda: (ledger.value(), ledger.cump_value())
+
+
+def _storage_database(size):
+    import storage
+    directory = tempfile.mkdtemp(prefix='bench-')
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    path = os.path.join(directory, 'bench.db')
+    data = production_frame(size)
+    storage.add_data_many(data[['Temps de Production', 'Nombre de Produits Fabriqués', 'Temps d\'Arrêt',
+                                'Nombre de Pannes']].itertuples(index=False, name=None), batch_size=50_000, path=path)
+    return storage, path
+
+
+@benchmark('storage.get_data', max_size=1_000_000)
+def bench_get_data(size):
+    storage, path = _storage_database(size)
+    return lambda: storage.get_data(path)
+
+
+# Prévision de tendance : réajustement complet (get_data + make_forecast) contre statistiques tenues à jour
+@benchmark('storage.get_data+make_forecast', max_size=1_000_000)
+def bench_refit_forecast(size):
+    from linear_forecast import make_forecast
+    storage, path = _storage_database(size)
+    return lambda: make_forecast(storage.get_data(path))
+
+
+@benchmark('storage.get_trend_forecast')
+def bench_trend_forecast(size):
+    storage, path = _storage_database(size)
+    return lambda: storage.get_trend_forecast(path=path)
+
+
+@benchmark('storage.get_totals')
+def bench_get_totals(size):
+    storage, path = _storage_database(size)
+    return lambda: storage.get_totals(path)
+
+
+# 100 insertions unitaires (un commit chacune) dans une table de size lignes
+@benchmark('storage.add_data', max_size=1_000_000)
+def bench_add_data(size):
+    storage, path = _storage_database(size)
+
+    def run():
+        for _ in range(100):
+            storage.add_data(4.0, 100, 0.5, 1, path=path)
+    return run
+
+
+# Fonction pour chronométrer une fonction : meilleur temps sur plusieurs répétitions et pic mémoire (tracemalloc)
+def measure(function, repeat=3):
+    function()  # Échauffement (imports, caches)
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def run_benchmarks(sizes, names=None, repeat=3):
+    results = []
+    for name, (setup, max_size) in BENCHMARKS.items():
+        if names and not any(pattern in name for pattern in names):
+            continue
+        for size in sizes:
+            if max_size is not None and size > max_size:
+                continue
+            try:
+                function = setup(size)
+            except ImportError as error:
+                print(f"{name:40} {size:>10}  ignoré ({error})")
+                break
+            seconds, peak = measure(function, repeat)
+            results.append({'name': name, 'size': size, 'seconds': seconds, 'peak_bytes': peak})
+            print(f"{name:40} {size:>10}  {seconds * 1000:10.3f} ms  {peak / 1e6:9.2f} Mo")
+    return {'meta': _meta(), 'results': results}
+
+
+def _meta():
+    return {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+    }
+
+
+# Fonction pour lister les modules importés au niveau supérieur d'une application (hors Streamlit)
+def app_imports(path):
+    with open(path, encoding='utf-8') as file:
+        tree = ast.parse(file.read(), path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            names = [node.module]
+        else:
+            continue
+        modules += [name for name in names if name.split('.')[0] != 'streamlit' and name not in modules]
+    return modules
+
+
+# Fonction pour mesurer le temps d'import des modules d'une application dans un interpréteur neuf
+# (python -X importtime), Streamlit étant déjà chargé comme dans le serveur ; renvoie le meilleur temps
+# total et le temps cumulé de chaque import de premier niveau
+def import_time(modules, repeat=3):
+    code = "import streamlit\n" + "\n".join(f"import {module}" for module in modules)
+    best, best_modules = float('inf'), {}
+    for _ in range(repeat):
+        completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True,
+                                   cwd=BENCH_DIR)
+        if completed.returncode != 0:
+            raise ImportError(completed.stderr.strip().splitlines()[-1])
+        cumulative = {}
+        for line in completed.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, micros, name = line.split('|')
+            # Imports de premier niveau de l'application (les imports imbriqués sont indentés)
+            if not name.startswith('  ') and name.strip() in modules:
+                cumulative[name.strip()] = int(micros) / 1e6
+        total = sum(cumulative.values())
+        if total < best:
+            best, best_modules = total, cumulative
+    return best, best_modules
+
+
+def run_startup(apps, repeat=3, budget=DEFAULT_STARTUP_BUDGET, top=5):
+    results = []
+    for app in apps:
+        try:
+            seconds, modules = import_time(app_imports(os.path.join(BENCH_DIR, app)), repeat)
+        except (ImportError, OSError) as error:
+            print(f"{app:12} ignoré ({error})")
+            continue
+        heaviest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:top]
+        results.append({'name': f"startup.{app}", 'size': 0, 'seconds': seconds, 'peak_bytes': 0,
+                        'modules': dict(heaviest)})
+        print(f"{app:12} {seconds * 1000:9.1f} ms  {'DÉPASSE LE BUDGET' if seconds > budget else ''}")
+        for name, module_seconds in heaviest:
+            print(f"    {name:40} {module_seconds * 1000:9.1f} ms")
+    return {'meta': {**_meta(), 'budget': budget}, 'results': results}
+
+
+# Fonction pour comparer deux fichiers de résultats ; renvoie la liste des régressions
+def compare(baseline, current, time_threshold=DEFAULT_TIME_THRESHOLD, memory_threshold=DEFAULT_MEMORY_THRESHOLD,
+            min_time_delta=DEFAULT_MIN_TIME_DELTA, min_memory_delta=DEFAULT_MIN_MEMORY_DELTA):
+    reference = {(result['name'], result['size']): result for result in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        base = reference.get((result['name'], result['size']))
+        if base is None:
+            continue
+        time_ratio = result['seconds'] / base['seconds'] if base['seconds'] > 0 else 1.0
+        memory_ratio = result['peak_bytes'] / base['peak_bytes'] if base['peak_bytes'] > 0 else 1.0
+        flags = []
+        if time_ratio > 1 + time_threshold and result['seconds'] - base['seconds'] > min_time_delta:
+            flags.append('temps')
+        if memory_ratio > 1 + memory_threshold and result['peak_bytes'] - base['peak_bytes'] > min_memory_delta:
+            flags.append('mémoire')
+        print(f"{result['name']:40} {result['size']:>10}  temps x{time_ratio:5.2f}  mémoire x{memory_ratio:5.2f}"
+              f"  {'RÉGRESSION (' + ', '.join(flags) + ')' if flags else ''}")
+        if flags:
+            regressions.append({**result, 'time_ratio': time_ratio, 'memory_ratio': memory_ratio, 'flags': flags})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks des chemins critiques (KPI, prévisions, stock, stockage)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="exécuter les benchmarks et écrire les résultats en JSON")
+    run_parser.add_argument('--sizes', type=float, nargs='+', default=DEFAULT_SIZES,
+                            help="tailles des jeux de données (ex. 1e3 1e5 1e7)")
+    run_parser.add_argument('--only', nargs='+', help="ne lancer que les benchmarks dont le nom contient ces textes")
+    run_parser.add_argument('--repeat', type=int, default=3)
+    run_parser.add_argument('--output', default='bench_results.json')
+
+    startup_parser = commands.add_parser('startup', help="mesurer le temps d'import de chaque application")
+    startup_parser.add_argument('apps', nargs='*', default=APPS)
+    startup_parser.add_argument('--repeat', type=int, default=3)
+    startup_parser.add_argument('--budget', type=float, default=DEFAULT_STARTUP_BUDGET,
+                                help="temps de démarrage maximal accepté (en secondes)")
+    startup_parser.add_argument('--output', default='startup_results.json')
+
+    compare_parser = commands.add_parser('compare', help="comparer des résultats à une référence enregistrée")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--time-threshold', type=float, default=DEFAULT_TIME_THRESHOLD)
+    compare_parser.add_argument('--memory-threshold', type=float, default=DEFAULT_MEMORY_THRESHOLD)
+    compare_parser.add_argument('--min-time-delta', type=float, default=DEFAULT_MIN_TIME_DELTA,
+                                help="écart de temps minimal (en secondes) pour signaler une régression")
+    compare_parser.add_argument('--min-memory-delta', type=int, default=DEFAULT_MIN_MEMORY_DELTA,
+                                help="écart de mémoire minimal (en octets) pour signaler une régression")
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        report = run_benchmarks([int(size) for size in args.sizes], args.only, args.repeat)
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"Résultats écrits dans {args.output}")
+        return 0
+    if args.command == 'startup':
+        report = run_startup(args.apps, args.repeat, args.budget)
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"Résultats écrits dans {args.output}")
+        return 1 if any(result['seconds'] > args.budget for result in report['results']) else 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+    regressions = compare(baseline, current, args.time_threshold, args.memory_threshold,
+                          args.min_time_delta, args.min_memory_delta)
+    print(f"{len(regressions)} régression(s)")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+from model_cache import ModelCache, make_key
+
+# Nombre de points envoyés au navigateur par défaut, quelle que soit la longueur de la série
+DEFAULT_TARGET_POINTS = 2000
+
+# Cache des séries réduites, par (données, méthode, nombre de points, zoom)
+chart_cache = ModelCache(max_bytes=32 * 1024 * 1024)
+
+
+# Fonction de réduction min/max : pour chaque tranche, garde le point le plus bas et le plus haut
+# (dans l'ordre d'origine), ce qui conserve les pics ; renvoie au plus target_points indices
+def minmax_indices(y, target_points):
+    n = len(y)
+    buckets = max(target_points // 2, 1)
+    if n <= target_points:
+        return np.arange(n)
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+    valid = ~np.all(np.isnan(padded), axis=1)
+    rows = np.flatnonzero(valid)
+    offsets = rows * size
+    low = offsets + np.nanargmin(padded[valid], axis=1)
+    high = offsets + np.nanargmax(padded[valid], axis=1)
+    return np.unique(np.concatenate([low, high]))
+
+
+# Fonction de réduction LTTB (Largest-Triangle-Three-Buckets) : garde dans chaque tranche le point
+# qui forme le plus grand triangle avec le point retenu précédemment et la moyenne de la tranche suivante
+def lttb_indices(x, y, target_points):
+    n = len(y)
+    if n <= target_points or target_points < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, target_points - 1).astype(int)
+    selected = np.empty(target_points, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(target_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_start, next_end = end, edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end].mean()
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+METHODS = {'minmax': 'Min/Max', 'lttb': 'LTTB'}
+
+
+# Fonction pour réduire une série avant affichage ; zoom = (début, fin) en positions dans la série
+# Le résultat (une Series indexée par la position d'origine) est mis en cache, sous l'empreinte des
+# données ou sous la clé fournie (key), ce qui évite de hacher une très longue série à chaque rerun
+def downsample(values, target_points=DEFAULT_TARGET_POINTS, method='minmax', zoom=None, key=None):
+    y = np.asarray(values, dtype=float)
+    start, end = zoom if zoom is not None else (0, len(y))
+    start, end = max(int(start), 0), min(int(end), len(y))
+
+    def compute():
+        window = y[start:end]
+        if method == 'lttb':
+            indexes = lttb_indices(np.arange(len(window), dtype=float), window, target_points)
+        else:
+            indexes = minmax_indices(window, target_points)
+        return pd.Series(window[indexes], index=indexes + start)
+
+    key = make_key(y if key is None else key, method=method, target_points=target_points, zoom=(start, end))
+    return chart_cache.get_or_fit(key, compute)
+
+
+# Fonction pour afficher une série dans un graphique en ligne Streamlit, après réduction
+def line_chart(container, values, target_points=DEFAULT_TARGET_POINTS, method='minmax', zoom=None, key=None,
+               **kwargs):
+    reduced = downsample(values, target_points, method, zoom, key)
+    container.line_chart(reduced, **kwargs)
+    return reduced
+
+
+# Test de performance : temps de réduction et taille du contenu envoyé selon la longueur de la série
+if __name__ == '__main__':
+    import time
+
+    rng = np.random.default_rng(0)
+    for size in [10_000, 1_000_000, 10_000_000]:
+        series = np.cumsum(rng.normal(size=size))
+        raw_bytes = len(pd.Series(series).to_json())
+        for method in METHODS:
+            chart_cache.clear()
+            start = time.perf_counter()
+            reduced = downsample(series, method=method)
+            elapsed = time.perf_counter() - start
+            start = time.perf_counter()
+            downsample(series, method=method)
+            cached = time.perf_counter() - start
+            print(f"{size:>10} points, {METHODS[method]:7} : {len(reduced)} points, {len(reduced.to_json()):>8} octets "
+                  f"(brut {raw_bytes:,} octets), {elapsed * 1000:.1f} ms, {cached * 1000:.1f} ms en cache")
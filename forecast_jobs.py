@@ -0,0 +1,190 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import pandas as pd
+from model_cache import forecast_cache, make_key
+from profiling import timed
+
+# Nombre maximal d'entraînements simultanés (par défaut un par cœur)
+DEFAULT_MAX_WORKERS = int(os.environ.get('FORECAST_WORKERS', os.cpu_count() or 1))
+
+# Nombre de travaux terminés gardés dans l'historique (les plus anciens non récupérés sont oubliés)
+MAX_FINISHED_JOBS = 100
+
+# Libellés des états d'un travail
+PENDING = 'En attente'
+RUNNING = 'En cours'
+DONE = 'Terminé'
+FAILED = 'Échec'
+
+
+# Fonction exécutée dans un processus séparé : entraîne Prophet et renvoie la prévision du dernier horizon
+def prophet_forecast(ds, y, periods=1):
+    from fbprophet import Prophet
+    model = Prophet()
+    model.fit(pd.DataFrame({'ds': ds, 'y': y}))
+    future = model.make_future_dataframe(periods=periods)
+    forecast = model.predict(future)
+    return float(forecast.iloc[-1]['yhat'])
+
+
+# File de travaux exécutés dans un pool de processus (l'interface Streamlit n'est plus bloquée)
+class JobQueue:
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        self.max_workers = max_workers
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    # Abandonne un pool cassé sans attendre ses processus ; le suivant est créé à la demande
+    def _replace_executor(self):
+        self._executor.shutdown(wait=False)
+        self._executor = None
+
+    # Limite l'historique : les travaux terminés les plus anciens au-delà de MAX_FINISHED_JOBS sont oubliés
+    # (résultats jamais récupérés, par exemple d'une session fermée)
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job['future'].done()]
+        for job_id in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self._jobs[job_id]
+
+    def _get_executor(self):
+        # Le pool est créé au premier travail ; "spawn" évite de dupliquer les threads du serveur Streamlit
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    # Soumet fn(*args) au pool ; un travail identique (même clé) encore actif est réutilisé
+    # (chaque soumission compte une référence, rendue par forget une fois le résultat récupéré)
+    # on_done(résultat) est appelé dans le processus principal quand le travail réussit
+    def submit(self, fn, *args, key=None, name=None, on_done=None):
+        with self._lock:
+            if key is not None:
+                for job_id, job in self._jobs.items():
+                    if job['key'] == key and not job['future'].done():
+                        job['refs'] += 1
+                        return job_id
+            job_id = uuid.uuid4().hex[:12]
+            try:
+                future = self._get_executor().submit(fn, *args)
+            except BrokenProcessPool:
+                # Un processus du pool a été tué (ex. mémoire insuffisante) : on repart d'un pool neuf
+                self._replace_executor()
+                future = self._get_executor().submit(fn, *args)
+            job = {'name': name or job_id, 'key': key, 'future': future, 'submitted': time.time(), 'finished': None,
+                   'refs': 1}
+            self._jobs[job_id] = job
+            self._prune()
+
+        def finish(done_future):
+            job['finished'] = time.time()
+            if on_done is not None and done_future.exception() is None:
+                on_done(done_future.result())
+
+        future.add_done_callback(finish)
+        return job_id
+
+    # Applique fn à chaque élément dans le pool partagé et attend tous les résultats (dans l'ordre)
+    def map(self, fn, *iterables, chunksize=1):
+        with self._lock:
+            executor = self._get_executor()
+        try:
+            return list(executor.map(fn, *iterables, chunksize=chunksize))
+        except BrokenProcessPool:
+            with self._lock:
+                if self._executor is executor:
+                    self._replace_executor()
+                executor = self._get_executor()
+            return list(executor.map(fn, *iterables, chunksize=chunksize))
+
+    # État d'un travail (None s'il a été oublié)
+    def status(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        future = job['future']
+        if not future.done():
+            return RUNNING if future.running() else PENDING
+        return FAILED if future.exception() is not None else DONE
+
+    # Renvoie le résultat d'un travail terminé (None s'il n'est pas encore fini, l'exception s'il a échoué)
+    def result(self, job_id):
+        future = self._jobs[job_id]['future']
+        if not future.done():
+            return None
+        return future.exception() or future.result()
+
+    # Rend une référence à un travail terminé dont le résultat a été récupéré ; il est oublié quand
+    # toutes les sessions qui l'ont soumis l'ont récupéré
+    def forget(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job['future'].done():
+                job['refs'] -= 1
+                if job['refs'] <= 0:
+                    del self._jobs[job_id]
+
+    # Résumé des travaux, pour l'affichage (seulement ceux de job_ids s'il est fourni, ex. ceux d'une session)
+    def jobs(self, job_ids=None):
+        with self._lock:
+            items = list(self._jobs.items())
+        if job_ids is not None:
+            job_ids = set(job_ids)
+            items = [(job_id, job) for job_id, job in items if job_id in job_ids]
+        summary = []
+        for job_id, job in items:
+            end = job['finished'] or time.time()
+            summary.append({'Travail': job['name'], 'État': self.status(job_id),
+                            'Durée (s)': round(end - job['submitted'], 1), 'id': job_id})
+        return summary
+
+    # Oublie les travaux terminés
+    def clear_finished(self):
+        with self._lock:
+            for job_id in [job_id for job_id, job in self._jobs.items() if job['future'].done()]:
+                del self._jobs[job_id]
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+# File partagée par toutes les sessions (le module reste importé entre les reruns Streamlit)
+forecast_jobs = JobQueue()
+
+
+# Fonction pour préparer les colonnes ds / y de Prophet
+# (utilise la colonne de date du fichier si elle existe, sinon l'index)
+def prepare_prophet_data(data, column='Nombre de Produits Fabriqués'):
+    date_column = next((name for name in ['Date', 'Horodatage', 'ds'] if name in data.columns), None)
+    ds = pd.to_datetime(data[date_column]) if date_column else pd.Series(data.index, index=data.index)
+    return ds, data[column]
+
+
+# Fonction de prévision avec Prophet (synchrone)
+# La prévision est mise en cache : un même fichier n'est entraîné qu'une fois
+@timed('forecast_jobs.make_advanced_forecast')
+def make_advanced_forecast(data, periods=1):
+    ds, y = prepare_prophet_data(data)
+    key = make_key(ds, y, model='Prophet', periods=periods)
+    return forecast_cache.get_or_fit(key, lambda: prophet_forecast(ds, y, periods))
+
+
+# Fonction de prévision avec Prophet en arrière-plan (pool de processus)
+# Renvoie (prévision, None) si elle est déjà en cache, sinon (None, identifiant du travail)
+@timed('forecast_jobs.submit_advanced_forecast')
+def submit_advanced_forecast(data, name, periods=1):
+    ds, y = prepare_prophet_data(data)
+    key = make_key(ds, y, model='Prophet', periods=periods)
+    cached = forecast_cache.get(key)
+    if cached is not None:
+        return cached, None
+    job_id = forecast_jobs.submit(prophet_forecast, ds, y, periods, key=key, name=name,
+                                  on_done=lambda yhat: forecast_cache.put(key, yhat))
+    return None, job_id
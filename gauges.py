@@ -0,0 +1,98 @@
+import math
+from functools import lru_cache
+from profiling import timed
+
+# Précision d'affichage des jauges : les valeurs sont arrondies avant la mise en cache,
+# pour qu'un changement invisible à l'écran ne reconstruise pas la figure
+PRECISION = 2
+
+
+def _indicator(value, objective, title, bar_color, column):
+    import plotly.graph_objects as go
+    return go.Indicator(
+        mode="gauge+number",
+        value=value,
+        gauge=dict(
+            axis=dict(range=[0, objective]),
+            bar=dict(color=bar_color),
+            steps=[
+                {"range": [0, value], "color": "green"},
+                {"range": [value, objective], "color": "red"}
+            ],
+            threshold=dict(
+                line=dict(color="red", width=4),
+                thickness=0.75,
+                value=value
+            )
+        ),
+        title={"text": title},
+        domain={"row": 0, "column": column},
+    )
+
+
+# Fonction pour arrondir une valeur de jauge ; None ou NaN (agrégat sur des cellules vides) donne default
+def _rounded(value, default=0.0):
+    value = default if value is None else float(value)
+    if math.isnan(value):
+        value = default
+    return round(value, PRECISION)
+
+
+@lru_cache(maxsize=256)
+def _gauge_panel(values, objectives, titles, bar_color, height):
+    # Plotly n'est chargé qu'au premier panneau affiché (et non au démarrage de l'application)
+    import plotly.graph_objects as go
+    figure = go.Figure([
+        _indicator(value, objective, title, bar_color, column)
+        for column, (value, objective, title) in enumerate(zip(values, objectives, titles))
+    ])
+    figure.update_layout(grid={"rows": 1, "columns": len(values), "pattern": "independent"}, height=height,
+                         margin=dict(l=30, r=30, t=60, b=20))
+    # Spécification figée (dictionnaire) : le même objet est renvoyé tant que les KPI ne changent pas,
+    # et Streamlit ne renvoie pas au navigateur un message identique à celui qu'il a déjà en cache
+    return figure.to_dict()
+
+
+# Fonction pour construire un panneau de jauges (une seule figure, une jauge par KPI), mémorisé
+# sur les valeurs arrondies, les objectifs, les titres et la couleur
+@timed('gauges.gauge_panel')
+def gauge_panel(values, objectives, titles, bar_color="lightblue", height=300):
+    values = tuple(_rounded(value) for value in values)
+    # Objectif manquant : la jauge est graduée jusqu'à la valeur elle-même
+    objectives = tuple(_rounded(objective, value) for objective, value in zip(objectives, values))
+    return _gauge_panel(values, objectives, tuple(titles), bar_color, height)
+
+
+# Comparaison : trois figures reconstruites à chaque rerun contre un panneau mémorisé
+if __name__ == '__main__':
+    import time
+    import plotly.graph_objects as go
+    import plotly.io as pio
+
+    reruns = 200
+    kpis = (87.5, 6.25, 1.5)
+    objectives = (100, 8, 2)
+    titles = ("Taux de Production (%)", "Temps Moyen Entre Pannes (MTBF)", "Temps Moyen de Réparation (MTTR)")
+
+    start = time.perf_counter()
+    for _ in range(reruns):
+        payload = 0
+        for value, objective, title in zip(kpis, objectives, titles):
+            figure = go.Figure()
+            figure.add_trace(_indicator(value, objective, title, "lightblue", 0))
+            payload += len(pio.to_json(figure))
+    separate = (time.perf_counter() - start) / reruns
+
+    _gauge_panel.cache_clear()
+    start = time.perf_counter()
+    panel = gauge_panel(kpis, objectives, titles)
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(reruns):
+        gauge_panel(kpis, objectives, titles)
+    memoized = (time.perf_counter() - start) / reruns
+    panel_payload = len(pio.to_json(panel))
+
+    print(f"3 figures séparées : {separate * 1000:.2f} ms par rerun, {payload} octets envoyés à chaque rerun")
+    print(f"panneau unique : {first * 1000:.2f} ms au premier rendu, {memoized * 1e6:.1f} µs ensuite, "
+          f"{panel_payload} octets (renvoyés seulement si les KPI changent)")
@@ -0,0 +1,113 @@
+from functools import lru_cache
+import numpy as np
+
+# Nombre de classes de l'histogramme fin, à partir duquel les histogrammes affichés sont recalculés
+FINE_BINS = 65536
+# Taille des blocs générés puis comptés pour les grands échantillons (mémoire constante)
+CHUNK_SIZE = 1_000_000
+# Au-delà de cette taille, l'échantillon n'est pas conservé : il est généré et compté par blocs
+SAMPLE_LIMIT = 1_000_000
+# Plage fixe des grands échantillons (en écarts-types) ; les rares valeurs au-delà vont dans les classes extrêmes
+LOW, HIGH = -8.0, 8.0
+
+
+def _read_only(array):
+    array.flags.writeable = False
+    return array
+
+
+# Échantillon de loi normale centrée réduite, mis en cache par (taille, graine)
+@lru_cache(maxsize=8)
+def normal_sample(size, seed=0):
+    if size > SAMPLE_LIMIT:
+        raise ValueError(f"Échantillon trop grand pour être conservé ({size} > {SAMPLE_LIMIT}).")
+    return _read_only(np.random.default_rng(seed).standard_normal(size))
+
+
+# Premières valeurs d'un échantillon (identiques quelle que soit la taille, pour l'aperçu)
+def normal_head(rows=5, seed=0):
+    return np.random.default_rng(seed).standard_normal(rows)
+
+
+# Histogramme fin d'un échantillon normal, mis en cache par (taille, graine)
+# Petits échantillons : classes entre le minimum et le maximum (comme ax.hist)
+# Grands échantillons : générés et comptés par blocs de CHUNK_SIZE sur [LOW, HIGH], sans jamais
+# conserver les données brutes ; la plage est ensuite réduite aux classes non vides
+@lru_cache(maxsize=8)
+def normal_histogram(size, seed=0, fine_bins=FINE_BINS, chunk_size=CHUNK_SIZE):
+    if size <= SAMPLE_LIMIT:
+        data = normal_sample(size, seed)
+        low, high = float(data.min()), float(data.max())
+        if low == high:
+            low, high = low - 0.5, high + 0.5
+        counts, edges = np.histogram(data, bins=fine_bins, range=(low, high))
+        return _read_only(counts.astype(np.int64)), _read_only(edges)
+
+    rng = np.random.default_rng(seed)
+    counts = np.zeros(fine_bins, dtype=np.int64)
+    scale = fine_bins / (HIGH - LOW)
+    buffer = np.empty(chunk_size)
+    indexes = np.empty(chunk_size, dtype=np.intp)
+    remaining = size
+    while remaining > 0:
+        n = min(chunk_size, remaining)
+        chunk = buffer[:n]
+        rng.standard_normal(out=chunk)
+        chunk -= LOW
+        chunk *= scale
+        np.clip(chunk, 0, fine_bins - 1, out=chunk)
+        index = indexes[:n]
+        index[...] = chunk  # Troncature vers l'entier inférieur (valeurs positives)
+        counts += np.bincount(index, minlength=fine_bins)
+        remaining -= n
+    edges = np.linspace(LOW, HIGH, fine_bins + 1)
+    nonzero = np.flatnonzero(counts)
+    first, last = nonzero[0], nonzero[-1] + 1
+    return _read_only(counts[first:last].copy()), _read_only(edges[first:last + 1].copy())
+
+
+# Fonction pour regrouper un histogramme fin en num_bins classes égales, sans relire les données
+# (les effectifs d'une classe fine coupée en deux sont répartis proportionnellement)
+def rebin(counts, edges, num_bins):
+    cumulative = np.concatenate([[0], np.cumsum(counts)])
+    coarse_edges = np.linspace(edges[0], edges[-1], num_bins + 1)
+    coarse_cumulative = np.interp(coarse_edges, edges, cumulative)
+    return np.diff(coarse_cumulative), coarse_edges
+
+
+# Fonction pour dessiner un histogramme déjà compté sur un axe Matplotlib
+def plot_histogram(ax, counts, edges):
+    ax.hist(edges[:-1], bins=edges, weights=counts)
+
+
+# Test de performance : histogramme d'un très grand échantillon à mémoire constante, puis recalculs
+if __name__ == '__main__':
+    import argparse
+    import time
+    import tracemalloc
+
+    parser = argparse.ArgumentParser(description="Histogramme par blocs de grands échantillons normaux")
+    parser.add_argument('--size', type=float, default=1e8)
+    args = parser.parse_args()
+    size = int(args.size)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    counts, edges = normal_histogram(size)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{size} valeurs comptées en {elapsed:.2f} s ({size / elapsed:,.0f} valeurs/s), "
+          f"pic mémoire {peak / 1e6:.1f} Mo (les données brutes feraient {size * 8 / 1e6:,.0f} Mo)")
+
+    start = time.perf_counter()
+    for num_bins in range(5, 51):
+        coarse, _ = rebin(counts, edges, num_bins)
+    print(f"46 recalculs de classes (5 à 50) : {(time.perf_counter() - start) * 1000:.2f} ms au total, "
+          f"total conservé : {int(round(coarse.sum()))} / {size}")
+
+    data = np.random.default_rng(1).standard_normal(100_000)
+    fine_counts, fine_edges = np.histogram(data, bins=FINE_BINS, range=(data.min(), data.max()))
+    exact, _ = np.histogram(data, bins=20)
+    approx, _ = rebin(fine_counts, fine_edges, 20)
+    print(f"écart maximal avec np.histogram (100 000 valeurs, 20 classes) : {np.abs(exact - approx).max():.2f}")
@@ -0,0 +1,328 @@
+import argparse
+import asyncio
+import json
+import math
+import numbers
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import storage
+
+# Adresse du service d'ingestion (socket TCP local, un événement JSON par ligne)
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = int(os.environ.get('INGEST_PORT', 8765))
+# Micro-lots : écriture dès que BATCH_SIZE événements sont en attente, ou au plus tard après FLUSH_INTERVAL secondes
+BATCH_SIZE = 2000
+FLUSH_INTERVAL = 0.05
+# Regroupement : une ligne par machine et par micro-lot (sommes des événements) au lieu d'une ligne par événement
+AGGREGATE = True
+# File d'attente bornée : au-delà, les connexions sont ralenties plutôt que la mémoire saturée
+MAX_QUEUE = 10_000
+
+# Types d'événements machine :
+#   production : {"type": "production", "machine": "M1", "count": 12, "hours": 0.1}
+#   stop_start / stop_end : début et fin d'un arrêt (la durée est calculée à la fin)
+#   failure : une panne
+# Champs facultatifs : "ts" (horodatage de l'événement, epoch en secondes) et "sent" (heure d'envoi, pour la latence)
+EVENT_TYPES = ('production', 'stop_start', 'stop_end', 'failure')
+
+
+# Fonction pour lire un horodatage epoch en secondes (nombre fini) ; ValueError sinon
+def _epoch(value):
+    if isinstance(value, bool) or not isinstance(value, numbers.Real) or not math.isfinite(value):
+        raise ValueError(f"Horodatage invalide : {value!r}")
+    return float(value)
+
+
+# Fonction pour convertir un événement en ligne de production_data (ou None s'il n'en produit pas)
+# open_stops garde l'heure de début des arrêts en cours, par machine
+# Les champs "ts" et "sent" sont vérifiés ici (ValueError si invalides), avant toute écriture en base
+def event_row(event, open_stops):
+    kind = event.get('type')
+    timestamp = time.time() if event.get('ts') is None else _epoch(event['ts'])
+    if 'sent' in event:
+        event['sent'] = _epoch(event['sent'])
+    machine = event.get('machine')
+    if kind == 'production':
+        return (float(event.get('hours', 0.0)), int(event.get('count', 0)), 0.0, 0, timestamp)
+    if kind == 'failure':
+        return (0.0, 0, 0.0, 1, timestamp)
+    if kind == 'stop_start':
+        open_stops[machine] = timestamp
+        return None
+    if kind == 'stop_end':
+        started = open_stops.pop(machine, None)
+        if started is None:
+            return None
+        return (0.0, 0, max(timestamp - started, 0.0) / 3600, 0, timestamp)
+    raise ValueError(f"Type d'événement inconnu : {kind!r}")
+
+
+# Fonction pour additionner les lignes d'un micro-lot par machine (horodatage de la dernière ligne)
+def aggregate_rows(machines, rows):
+    totals = {}
+    for machine, row in zip(machines, rows):
+        total = totals.get(machine)
+        if total is None:
+            totals[machine] = list(row)
+        else:
+            total[0] += row[0]
+            total[1] += row[1]
+            total[2] += row[2]
+            total[3] += row[3]
+            total[4] = row[4]
+    return [tuple(total) for total in totals.values()]
+
+
+# Service d'ingestion : reçoit les événements (socket ou fichier suivi), les regroupe en micro-lots
+# et les écrit dans la base avec un commit par lot
+class EventIngester:
+    def __init__(self, path=None, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, max_queue=MAX_QUEUE,
+                 aggregate=AGGREGATE):
+        self.path = path
+        self.aggregate = aggregate
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.open_stops = {}
+        # Un seul thread d'écriture : une seule connexion SQLite, les lots sont écrits dans l'ordre
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ingest-writer')
+        self.received = self.processed = self.written = self.rejected = self.batches = self.failed = 0
+        self.latencies = deque(maxlen=100_000)
+
+    async def put(self, event):
+        await self.queue.put(event)
+        self.received += 1
+
+    async def put_line(self, line):
+        line = line.strip()
+        if not line:
+            return
+        try:
+            event = json.loads(line)
+        except ValueError:
+            self.rejected += 1
+            return
+        await self.put(event)
+
+    # Récupère un micro-lot : attend un premier événement, puis complète jusqu'à batch_size ou flush_interval
+    async def _next_batch(self):
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def run_writer(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            rows, machines, sent = [], [], []
+            for event in batch:
+                try:
+                    row = event_row(event, self.open_stops)
+                except (ValueError, TypeError, AttributeError):
+                    self.rejected += 1
+                    continue
+                if row is not None:
+                    rows.append(row)
+                    machines.append(event.get('machine'))
+                if 'sent' in event:
+                    sent.append(event['sent'])
+            if rows:
+                if self.aggregate:
+                    rows = aggregate_rows(machines, rows)
+                # Un lot en échec est compté et signalé, sans arrêter l'ingestion des lots suivants
+                try:
+                    await loop.run_in_executor(self._executor, storage.add_data_many, rows, len(rows), self.path)
+                except Exception as error:
+                    self.failed += len(rows)
+                    print(f"Échec d'écriture d'un lot de {len(rows)} lignes : {type(error).__name__}: {error}",
+                          file=sys.stderr)
+                    sent = []
+                else:
+                    self.written += len(rows)
+                    self.batches += 1
+            self.processed += len(batch)
+            # Latence de bout en bout : de l'envoi par la machine au commit dans la base
+            now = time.time()
+            self.latencies.extend(now - value for value in sent)
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                await self.put_line(line)
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        return await asyncio.start_server(self.handle_client, host, port, limit=1024 * 1024)
+
+    # Suit un fichier d'événements (un JSON par ligne) comme tail -f ; les lignes incomplètes sont attendues
+    async def tail(self, file_path, poll_interval=0.2, from_start=False):
+        with open(file_path, 'r', encoding='utf-8') as file:
+            if not from_start:
+                file.seek(0, os.SEEK_END)
+            pending = ''
+            while True:
+                chunk = file.readline()
+                if not chunk:
+                    await asyncio.sleep(poll_interval)
+                    continue
+                pending += chunk
+                if pending.endswith('\n'):
+                    await self.put_line(pending)
+                    pending = ''
+
+    def stats(self):
+        latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+        return {
+            'Reçus': self.received,
+            'Lignes écrites': self.written,
+            'Rejetés': self.rejected,
+            'Lignes en échec': self.failed,
+            'Lots': self.batches,
+            'En attente': self.queue.qsize(),
+            'Latence p50 (ms)': float(np.percentile(latencies, 50) * 1000),
+            'Latence p99 (ms)': float(np.percentile(latencies, 99) * 1000),
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+# Générateur d'événements simulés pour une machine (production, arrêts et pannes)
+def simulated_events(machine, rng):
+    while True:
+        draw = rng.random()
+        if draw < 0.9:
+            yield {'type': 'production', 'machine': machine, 'count': int(rng.integers(1, 20)),
+                   'hours': float(rng.uniform(0.001, 0.01))}
+        elif draw < 0.97:
+            yield {'type': 'stop_start', 'machine': machine}
+            yield {'type': 'stop_end', 'machine': machine, 'ts': time.time() + float(rng.uniform(60, 600))}
+        else:
+            yield {'type': 'failure', 'machine': machine}
+
+
+async def _send_events(host, port, machine, count, rate, seed):
+    _, writer = await asyncio.open_connection(host, port)
+    events = simulated_events(machine, np.random.default_rng(seed))
+    start = time.perf_counter()
+    for number in range(count):
+        event = next(events)
+        event['sent'] = time.time()
+        writer.write(json.dumps(event).encode() + b'\n')
+        if number % 500 == 0:
+            await writer.drain()
+            # Cadence cible par connexion (0 = au plus vite)
+            if rate:
+                delay = start + number / rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+    await writer.drain()
+    writer.close()
+    await writer.wait_closed()
+
+
+# Test de charge : clients simulés -> service d'ingestion -> base ; débit soutenu et latence de bout en bout
+async def load_test(path, events=200_000, clients=4, rate=0, host=DEFAULT_HOST, port=0,
+                    batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, aggregate=AGGREGATE):
+    ingester = EventIngester(path, batch_size, flush_interval, aggregate=aggregate)
+    writer_task = asyncio.create_task(ingester.run_writer())
+    server = await ingester.serve(host, port)
+    port = server.sockets[0].getsockname()[1]
+    per_client = events // clients
+    start = time.perf_counter()
+    await asyncio.gather(*[_send_events(host, port, f"M{n}", per_client, rate / clients if rate else 0, n)
+                           for n in range(clients)])
+    # Attente de l'écriture du dernier micro-lot
+    while ingester.processed < per_client * clients:
+        await asyncio.sleep(0.005)
+    elapsed = time.perf_counter() - start
+    server.close()
+    await server.wait_closed()
+    writer_task.cancel()
+    ingester.close()
+    stats = ingester.stats()
+    stats['Durée (s)'] = elapsed
+    stats['Événements/s'] = ingester.received / elapsed
+    return stats
+
+
+async def _serve_forever(args):
+    ingester = EventIngester(args.db, args.batch_size, args.flush_interval, aggregate=not args.raw)
+    tasks = [asyncio.create_task(ingester.run_writer())]
+    server = await ingester.serve(args.host, args.port)
+    print(f"Ingestion en écoute sur {args.host}:{args.port}")
+    for file_path in args.tail or []:
+        tasks.append(asyncio.create_task(ingester.tail(file_path)))
+        print(f"Suivi du fichier {file_path}")
+    async with server:
+        while True:
+            # Une tâche terminée (écriture ou suivi de fichier) est une erreur : elle est remontée au lieu
+            # de laisser la file se remplir sans écrivain
+            done, _ = await asyncio.wait(tasks, timeout=10, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+                raise RuntimeError("Tâche d'ingestion arrêtée")
+            print(ingester.stats())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Service d'ingestion des événements machine (micro-lots)")
+    parser.add_argument('--db', default=None, help="base SQLite (défaut : storage.DB_PATH)")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--flush-interval', type=float, default=FLUSH_INTERVAL)
+    parser.add_argument('--raw', action='store_true', help="une ligne par événement (sans regroupement par machine)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help="écouter sur un socket local et/ou suivre des fichiers")
+    serve_parser.add_argument('--host', default=DEFAULT_HOST)
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument('--tail', nargs='+', help="fichiers d'événements à suivre (un JSON par ligne)")
+
+    load_parser = commands.add_parser('loadtest', help="test de charge avec des machines simulées")
+    load_parser.add_argument('--events', type=float, default=200_000)
+    load_parser.add_argument('--clients', type=int, default=4)
+    load_parser.add_argument('--rate', type=float, default=0, help="événements/s au total (0 = au plus vite)")
+
+    args = parser.parse_args(argv)
+    if args.command == 'serve':
+        try:
+            asyncio.run(_serve_forever(args))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    path = args.db
+    if path is None:
+        import tempfile
+        path = os.path.join(tempfile.mkdtemp(prefix='ingest-'), 'ingest.db')
+    stats = asyncio.run(load_test(path, int(args.events), args.clients, args.rate,
+                                  batch_size=args.batch_size, flush_interval=args.flush_interval,
+                                  aggregate=not args.raw))
+    for name, value in stats.items():
+        print(f"{name:20} {value:,.2f}" if isinstance(value, float) else f"{name:20} {value:,}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+# Colonnes utilisées pour le calcul des KPI
+TIME = 'Temps de Production'
+PRODUCTION = 'Nombre de Produits Fabriqués'
+DOWNTIME = 'Temps d\'Arrêt'
+FAILURES = 'Nombre de Pannes'
+SUM_COLUMNS = [TIME, PRODUCTION, DOWNTIME, FAILURES]
+KPI_COLUMNS = ['Taux de Production', 'MTBF', 'MTTR']
+
+
+# Fonction pour calculer les KPI à partir de sommes (scalaires ou tableaux, calcul vectorisé)
+# max_capacity=None : taux de production non rapporté à la capacité (produits / heure x 100)
+# sinon taux en % de la capacité ; tous les KPI valent 0 si le temps ou la capacité est nul
+def kpis_from_sums(total_time, total_production, total_downtime, total_failures, max_capacity=None):
+    total_time = np.asarray(total_time, dtype=float)
+    total_production = np.asarray(total_production, dtype=float)
+    total_downtime = np.asarray(total_downtime, dtype=float)
+    total_failures = np.asarray(total_failures, dtype=float)
+    capacity = 1.0 if max_capacity is None else float(max_capacity)
+
+    valid = (total_time > 0) & (capacity > 0)
+    has_failures = valid & (total_failures > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        production_rate = np.where(valid, total_production / total_time / capacity * 100, 0.0)
+        mtbf = np.where(has_failures, total_time / total_failures, 0.0)
+        mttr = np.where(has_failures, total_downtime / total_failures, 0.0)
+    return production_rate, mtbf, mttr
+
+
+# Fonction pour calculer les KPI d'un DataFrame (ou du dictionnaire de totaux de storage.get_totals)
+def calculate_kpis(data, max_capacity=None):
+    if isinstance(data, dict):
+        sums = [data[column] for column in SUM_COLUMNS]
+    else:
+        sums = [data[column].sum() for column in SUM_COLUMNS]
+    production_rate, mtbf, mttr = kpis_from_sums(*sums, max_capacity=max_capacity)
+    return float(production_rate), float(mtbf), float(mttr)
+
+
+# Fonction pour calculer les KPI par groupe (machine, ligne, équipe...) en une seule passe vectorisée
+# by : nom de colonne ou liste de colonnes ; renvoie un DataFrame indexé par groupe (sommes + KPI)
+def calculate_kpis_by_group(data, by, max_capacity=None):
+    if isinstance(by, str):
+        codes, groups = pd.factorize(data[by], sort=True)
+        index = pd.Index(groups, name=by)
+    else:
+        grouped = data.groupby(by, sort=True, observed=True)
+        # ngroup renvoie NaN (en float) pour les lignes dont une des clés est manquante
+        codes = grouped.ngroup().fillna(-1).to_numpy().astype(np.intp)
+        index = grouped.size().index
+    size = len(index)
+    valid = codes >= 0  # Les lignes dont la clé de groupe est manquante sont ignorées
+    if not valid.all():
+        codes = codes[valid]
+    sums = {}
+    for column in SUM_COLUMNS:
+        values = data[column].to_numpy(dtype=float)
+        if not valid.all():
+            values = values[valid]
+        sums[column] = np.bincount(codes, weights=np.nan_to_num(values), minlength=size)
+    result = pd.DataFrame(sums, index=index)
+    result['Taux de Production'], result['MTBF'], result['MTTR'] = kpis_from_sums(
+        *(sums[column] for column in SUM_COLUMNS), max_capacity=max_capacity)
+    return result
+
+
+# Test de performance sur des données synthétiques
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Performance du calcul des KPI par groupe")
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--machines', type=int, default=500)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({
+        'Machine': rng.integers(0, args.machines, args.rows),
+        'Équipe': rng.integers(0, 3, args.rows),
+        TIME: rng.uniform(1, 8, args.rows),
+        PRODUCTION: rng.integers(0, 500, args.rows),
+        DOWNTIME: rng.uniform(0, 1, args.rows),
+        FAILURES: rng.integers(0, 3, args.rows),
+    })
+
+    start = time.perf_counter()
+    calculate_kpis(data, 100)
+    print(f"{args.rows} lignes, KPI globaux : {time.perf_counter() - start:.3f} s")
+    for by in ['Machine', ['Machine', 'Équipe']]:
+        start = time.perf_counter()
+        result = calculate_kpis_by_group(data, by, 100)
+        elapsed = time.perf_counter() - start
+        expected = data.groupby(by)[SUM_COLUMNS].sum()
+        np.testing.assert_allclose(result[SUM_COLUMNS].to_numpy(), expected.to_numpy(), rtol=1e-9)
+        print(f"{args.rows} lignes, KPI par {by} ({len(result)} groupes) : {elapsed:.3f} s")
+
+    # Clés de groupe manquantes (machine ou équipe non renseignée) : lignes ignorées, comme dans groupby
+    sample = data.head(10_000).astype({'Machine': float, 'Équipe': float})
+    sample.loc[sample.index[::7], 'Équipe'] = np.nan
+    sample.loc[sample.index[::11], 'Machine'] = np.nan
+    for by in ['Machine', ['Machine', 'Équipe']]:
+        result = calculate_kpis_by_group(sample, by, 100)
+        expected = sample.groupby(by)[SUM_COLUMNS].sum()
+        np.testing.assert_allclose(result[SUM_COLUMNS].to_numpy(), expected.to_numpy(), rtol=1e-9)
+    print("clés manquantes : résultats identiques à groupby")
@@ -0,0 +1,119 @@
+import numpy as np
+from profiling import timed
+
+
+# Fonction pour ajuster une droite par moindres carrés sur plusieurs séries à la fois (forme fermée)
+# Y : tableau (nombre de séries, nombre de points) ; les NaN marquent les points absents
+# x : abscisses communes à toutes les séries (par défaut 0, 1, ..., n-1)
+def fit_linear(Y, x=None):
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    x = np.arange(Y.shape[1], dtype=float) if x is None else np.asarray(x, dtype=float)
+    mask = ~np.isnan(Y)
+    Yz = np.where(mask, Y, 0.0)
+    X = np.where(mask, x, 0.0)
+
+    n = mask.sum(axis=1)
+    safe_n = np.maximum(n, 1)
+    x_mean = X.sum(axis=1) / safe_n
+    y_mean = Yz.sum(axis=1) / safe_n
+    dx = np.where(mask, x - x_mean[:, None], 0.0)
+    dy = np.where(mask, Yz - y_mean[:, None], 0.0)
+    sxx = np.einsum('ij,ij->i', dx, dx)
+    sxy = np.einsum('ij,ij->i', dx, dy)
+
+    # Séries constantes en x (un seul point) : pente nulle, comme LinearRegression
+    slope = np.divide(sxy, sxx, out=np.zeros_like(sxy), where=sxx > 0)
+    intercept = y_mean - slope * x_mean
+    residuals = dy - slope[:, None] * dx
+    sse = np.einsum('ij,ij->i', residuals, residuals)
+    slope[n == 0] = intercept[n == 0] = np.nan
+    return {'slope': slope, 'intercept': intercept, 'n': n, 'x_mean': x_mean, 'sxx': sxx, 'sse': sse}
+
+
+# Fonction pour prévoir plusieurs horizons pour toutes les séries en une passe vectorisée
+# Les horizons sont comptés à partir de la dernière colonne de Y (ou de x[-1]) ; x_future les remplace si fourni
+# Renvoie des tableaux (nombre de séries, nombre d'horizons) : prévision et intervalle de prédiction
+def forecast_linear(Y, horizons=(1,), x=None, x_future=None, confidence=0.95):
+    fit = fit_linear(Y, x)
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    if x_future is None:
+        last_x = Y.shape[1] - 1 if x is None else np.asarray(x, dtype=float)[-1]
+        x_future = last_x + np.asarray(horizons, dtype=float)
+    x_future = np.atleast_1d(np.asarray(x_future, dtype=float))
+
+    forecast = fit['intercept'][:, None] + fit['slope'][:, None] * x_future[None, :]
+
+    # Intervalle de prédiction : s * sqrt(1 + 1/n + (x0 - x_moyen)^2 / Sxx), loi de Student à n - 2 ddl
+    from scipy.stats import t as student
+    n = fit['n']
+    dof = n - 2
+    valid = (dof > 0) & (fit['sxx'] > 0)
+    s = np.sqrt(np.divide(fit['sse'], dof, out=np.full_like(fit['sse'], np.nan), where=valid))
+    leverage = np.divide((x_future[None, :] - fit['x_mean'][:, None]) ** 2, fit['sxx'][:, None],
+                         out=np.full(forecast.shape, np.nan), where=valid[:, None])
+    quantile = student.ppf(0.5 + confidence / 2, np.where(valid, dof, 1))
+    half_width = (quantile * s)[:, None] * np.sqrt(1 + 1 / np.maximum(n, 1)[:, None] + leverage)
+    return {
+        'forecast': forecast,
+        'lower': forecast - half_width,
+        'upper': forecast + half_width,
+        'slope': fit['slope'],
+        'intercept': fit['intercept'],
+    }
+
+
+# Fonction pour prévoir à partir des statistiques suffisantes d'une droite : poids total, moyennes
+# et co-moments centrés (pondérés si un facteur d'oubli est appliqué) ; coût constant
+# Renvoie la prévision en x_future et son intervalle de prédiction (NaN s'il y a moins de 3 points)
+def forecast_from_stats(weight, mean_x, mean_y, cxx, cxy, cyy, x_future, confidence=0.95):
+    slope = cxy / cxx if cxx > 0 else 0.0
+    forecast = mean_y + slope * (x_future - mean_x)
+    dof = weight - 2
+    if weight == 0:
+        return np.nan, np.nan, np.nan
+    if dof <= 0 or cxx <= 0:
+        return forecast, np.nan, np.nan
+    from scipy.stats import t as student
+    s = np.sqrt(max(cyy - slope * cxy, 0.0) / dof)
+    half_width = student.ppf(0.5 + confidence / 2, dof) * s * np.sqrt(1 + 1 / weight + (x_future - mean_x) ** 2 / cxx)
+    return forecast, forecast - half_width, forecast + half_width
+
+
+# Fonction pour faire une prévision (régression linéaire sur l'index, forme fermée NumPy)
+# Renvoie la prévision et son intervalle de prédiction à 95 %
+@timed('linear_forecast.make_forecast')
+def make_forecast(data):
+    x = np.array(data.index, dtype=float)  # Utilisation de l'index comme variable indépendante
+    y = data['Nombre de Produits Fabriqués'].to_numpy(dtype=float)  # Variable dépendante
+    result = forecast_linear(y[None, :], x=x, x_future=[len(data)])  # Index pour la prévision future
+    return result['forecast'][0, 0], result['lower'][0, 0], result['upper'][0, 0]
+
+
+# Vérification contre scikit-learn et mesure de l'accélération
+if __name__ == '__main__':
+    import argparse
+    import time
+    from sklearn.linear_model import LinearRegression
+
+    parser = argparse.ArgumentParser(description="Comparaison du moteur vectorisé avec LinearRegression")
+    parser.add_argument('--series', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--points', type=int, default=52)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    X = np.arange(args.points).reshape(-1, 1)
+    for count in args.series:
+        Y = rng.normal(100, 10, size=(count, args.points)) + rng.normal(0, 1, size=(count, 1)) * np.arange(args.points)
+
+        start = time.perf_counter()
+        expected = np.array([LinearRegression().fit(X, y).predict([[args.points]])[0] for y in Y])
+        sklearn_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = forecast_linear(Y, horizons=(1, 7, 30))
+        numpy_time = time.perf_counter() - start
+
+        np.testing.assert_allclose(result['forecast'][:, 0], expected, rtol=1e-9, atol=1e-7)
+        print(f"{count} séries x {args.points} points : scikit-learn {sklearn_time:.3f} s, "
+              f"NumPy {numpy_time * 1000:.1f} ms (3 horizons + intervalles), "
+              f"accélération x{sklearn_time / numpy_time:,.0f}")
@@ -0,0 +1,123 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# Taille mémoire maximale par défaut du cache (en octets, mesurée sur le modèle sérialisé)
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+# Fonction pour calculer la clé d'un modèle : empreinte des données d'entrée + paramètres du modèle
+def make_key(*series, **params):
+    digest = hashlib.sha256()
+    for values in series:
+        if isinstance(values, (pd.Series, pd.DataFrame, pd.Index)):
+            digest.update(pd.util.hash_pandas_object(values, index=not isinstance(values, pd.Index)).values.tobytes())
+        elif isinstance(values, np.ndarray):
+            # Hachage direct du tampon mémoire (sans copie ni sérialisation)
+            digest.update(f"{values.dtype}{values.shape}".encode())
+            digest.update(np.ascontiguousarray(values).view(np.uint8).reshape(-1))
+        else:
+            digest.update(pickle.dumps(values))
+    digest.update(repr(sorted(params.items())).encode())
+    return digest.hexdigest()
+
+
+# Cache LRU de modèles entraînés, borné en taille, avec stockage facultatif sur disque
+class ModelCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, disk_dir=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = self.evictions = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def _store(self, key, value, size):
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[1]
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    # Renvoie la valeur en cache, ou None si elle n'est ni en mémoire ni sur disque
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        if self.disk_dir and os.path.exists(self._disk_path(key)):
+            with open(self._disk_path(key), 'rb') as file:
+                payload = file.read()
+            value = pickle.loads(payload)
+            with self._lock:
+                self._store(key, value, len(payload))
+                self.disk_hits += 1
+            return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._store(key, value, len(payload))
+        if self.disk_dir:
+            # Écriture atomique : fichier temporaire puis renommage
+            tmp_path = f"{self._disk_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as file:
+                file.write(payload)
+            os.replace(tmp_path, self._disk_path(key))
+
+    # Renvoie le modèle en cache ou l'entraîne avec fit() puis le met en cache
+    def get_or_fit(self, key, fit):
+        value = self.get(key)
+        if value is None:
+            value = fit()
+            self.put(key, value)
+        return value
+
+    def clear(self, disk=False):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if disk and self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith('.pkl'):
+                    os.remove(os.path.join(self.disk_dir, name))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'Entrées': len(self._entries),
+                'Octets': self._bytes,
+                'Succès mémoire': self.hits,
+                'Succès disque': self.disk_hits,
+                'Échecs': self.misses,
+                'Évictions': self.evictions,
+                'Taux de succès': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+# Cache partagé par les applications (le module reste importé entre les reruns Streamlit)
+# Le stockage sur disque s'active avec la variable d'environnement MODEL_CACHE_DIR
+forecast_cache = ModelCache(
+    max_bytes=int(os.environ.get('MODEL_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)),
+    disk_dir=os.environ.get('MODEL_CACHE_DIR') or None,
+)
@@ -0,0 +1,182 @@
+import functools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+import numpy as np
+
+# Nombre de mesures conservées par section pour le calcul des percentiles
+WINDOW = 1000
+QUANTILES = (0.5, 0.9, 0.99)
+# Fichier de métriques au format texte Prometheus (lu par un node_exporter textfile collector, par exemple)
+METRICS_PATH = os.environ.get('PROFILING_METRICS_PATH', 'metrics.prom')
+
+_NULL_SECTION = nullcontext()
+
+
+class _Section:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+# Mesure des durées par section (fonction ou bloc de code) ; désactivé, chaque appel ne coûte
+# qu'un test d'attribut et aucune mesure n'est prise
+class Profiler:
+    def __init__(self, enabled=False, window=WINDOW, metrics_path=METRICS_PATH):
+        self.enabled = enabled
+        self.window = window
+        self.metrics_path = metrics_path
+        self._samples = {}
+        self._counts = {}
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+                self._counts[name] = 0
+                self._totals[name] = 0.0
+            samples.append(seconds)
+            self._counts[name] += 1
+            self._totals[name] += seconds
+
+    # Gestionnaire de contexte : with profiler.section('nom'): ...
+    def section(self, name):
+        if not self.enabled:
+            return _NULL_SECTION
+        return _Section(self, name)
+
+    # Décorateur : @profiler.timed('module.fonction') (nom qualifié de la fonction par défaut)
+    def timed(self, name=None):
+        def decorate(function):
+            label = name or f"{function.__module__}.{function.__qualname__}"
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.add(label, time.perf_counter() - start)
+            return wrapper
+        return decorate
+
+    # Début et fin d'une mesure qui ne tient pas dans un bloc (par exemple un rerun complet d'une application)
+    def start(self):
+        return time.perf_counter() if self.enabled else None
+
+    def stop(self, name, started):
+        if started is not None:
+            self.add(name, time.perf_counter() - started)
+
+    def stats(self):
+        with self._lock:
+            snapshot = {name: (np.array(samples), self._counts[name], self._totals[name])
+                        for name, samples in self._samples.items()}
+        rows = []
+        for name, (samples, count, total) in sorted(snapshot.items()):
+            percentiles = np.quantile(samples, QUANTILES) * 1000
+            rows.append({
+                'Section': name,
+                'Appels': count,
+                'p50 (ms)': percentiles[0],
+                'p90 (ms)': percentiles[1],
+                'p99 (ms)': percentiles[2],
+                'Max (ms)': samples.max() * 1000,
+                'Total (s)': total,
+            })
+        return rows
+
+    # Export au format texte Prometheus : un résumé (quantiles, somme, nombre d'appels) par section
+    def to_prometheus(self):
+        with self._lock:
+            snapshot = {name: (np.array(samples), self._counts[name], self._totals[name])
+                        for name, samples in self._samples.items()}
+        lines = ["# HELP app_section_seconds Durée des sections instrumentées des applications",
+                 "# TYPE app_section_seconds summary"]
+        for name, (samples, count, total) in sorted(snapshot.items()):
+            label = name.replace('\\', '\\\\').replace('"', '\\"')
+            for quantile, value in zip(QUANTILES, np.quantile(samples, QUANTILES)):
+                lines.append(f'app_section_seconds{{section="{label}",quantile="{quantile}"}} {value:.9f}')
+            lines.append(f'app_section_seconds_sum{{section="{label}"}} {total:.9f}')
+            lines.append(f'app_section_seconds_count{{section="{label}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    # Écriture atomique du fichier de métriques (fichier temporaire puis renommage)
+    def export(self, path=None):
+        path = path or self.metrics_path
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+        return path
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+            self._totals.clear()
+
+
+# Profileur partagé par les applications ; activé au démarrage avec PROFILING=1, ou depuis le panneau latéral
+profiler = Profiler(enabled=os.environ.get('PROFILING', '0') not in ('', '0'))
+section = profiler.section
+timed = profiler.timed
+
+
+# Fonction pour afficher le panneau de profilage (dans st.sidebar) et exporter les métriques
+def profiling_panel(container):
+    container.header("Profilage")
+    profiler.enabled = container.checkbox("Mesurer les temps d'exécution", value=profiler.enabled)
+    if not profiler.enabled:
+        return
+    rows = profiler.stats()
+    if rows:
+        container.dataframe(rows, hide_index=True)
+        container.caption(f"Métriques exportées dans {profiler.export()}")
+    if container.button("Réinitialiser les mesures"):
+        profiler.reset()
+
+
+# Coût d'un appel instrumenté, profilage désactivé puis activé
+if __name__ == '__main__':
+    calls = 1_000_000
+
+    def work():
+        return None
+
+    instrumented = profiler.timed('bench.work')(work)
+    for enabled in (False, True):
+        profiler.enabled = enabled
+        start = time.perf_counter()
+        for _ in range(calls):
+            work()
+        bare = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(calls):
+            instrumented()
+        timed_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(calls):
+            with profiler.section('bench.section'):
+                pass
+        section_time = time.perf_counter() - start
+        print(f"profilage {'activé' if enabled else 'désactivé'} : surcoût décorateur "
+              f"{(timed_time - bare) / calls * 1e9:.0f} ns/appel, bloc with {section_time / calls * 1e9:.0f} ns/appel")
+    print(profiler.to_prometheus())
@@ -0,0 +1,190 @@
+import numpy as np
+import pandas as pd
+from kpi import TIME, PRODUCTION, DOWNTIME, FAILURES, kpis_from_sums, calculate_kpis
+
+# Colonnes par défaut d'un journal d'événements machine (une ligne par événement)
+MACHINE = 'Machine'
+TIMESTAMP = 'Horodatage'
+EVENT = 'Événement'
+# Libellés reconnus (sans tenir compte de la casse) ; les autres événements sont ignorés
+FAILURE_EVENTS = ('panne', 'failure', 'stop_start')
+REPAIR_EVENTS = ('réparation', 'reparation', 'repair', 'stop_end')
+AVAILABILITY = 'Disponibilité'
+
+
+# Fonction pour convertir des horodatages (dates ou epoch en secondes) en heures
+def _to_hours(timestamps):
+    values = pd.Series(timestamps)
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=float) / 3600
+    return pd.to_datetime(values).to_numpy(dtype='datetime64[ns]').astype(np.int64) / 3.6e12
+
+
+# Fonction pour apparier pannes et réparations, machine par machine (tri + décalage, sans boucle Python)
+# Les pannes répétées avant une réparation comptent une seule fois (la première), de même que les
+# réparations répétées ; une panne sans réparation reste ouverte jusqu'à la fin de la période
+# Renvoie les codes machine, les noms, les intervalles d'arrêt et les bornes de la période par machine
+def pair_events(machines, timestamps, events, start=None, end=None):
+    # Les lignes incomplètes (cellules vides dans les journaux Excel) sont écartées avant le tri
+    machines, timestamps, events = pd.Series(machines), pd.Series(timestamps), pd.Series(events)
+    complete = (machines.notna() & timestamps.notna() & events.notna()).to_numpy()
+    if not complete.all():
+        machines, timestamps, events = machines[complete], timestamps[complete], events[complete]
+    # Les libellés sont comparés une seule fois par valeur distincte, puis propagés par leur code
+    kind_codes, kinds = pd.factorize(events)
+    kinds = pd.Series(kinds).astype(str).str.lower().to_numpy()
+    is_failure = np.isin(kinds, FAILURE_EVENTS)[kind_codes] & (kind_codes >= 0)
+    is_repair = np.isin(kinds, REPAIR_EVENTS)[kind_codes] & (kind_codes >= 0)
+    codes, names = pd.factorize(machines)
+    hours = _to_hours(timestamps)
+    if len(codes) == 0:
+        empty = np.array([], dtype=float)
+        return np.array([], dtype=np.intp), names, empty, empty, empty, empty
+
+    # Tri par machine puis par date (une panne passe avant une réparation au même instant) : tris stables
+    # successifs, plus rapides que np.lexsort ; codes machine en int16 (tri par base) quand c'est possible
+    order = np.r_[np.flatnonzero(is_failure), np.flatnonzero(~is_failure)]
+    order = order[np.argsort(hours[order], kind='stable')]
+    small_codes = codes.astype(np.int16) if len(names) < np.iinfo(np.int16).max else codes
+    order = order[np.argsort(small_codes[order], kind='stable')]
+    codes, hours, is_failure, is_repair = codes[order], hours[order], is_failure[order], is_repair[order]
+
+    # Période observée par machine : du premier au dernier événement (quel qu'il soit), sauf bornes fournies
+    count = len(names)
+    segment_start = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    segment_end = np.r_[segment_start[1:], len(codes)]
+    window_start = hours[segment_start] if start is None else np.full(count, _to_hours([start])[0])
+    window_end = hours[segment_end - 1] if end is None else np.full(count, _to_hours([end])[0])
+
+    # Seuls les pannes et réparations sont appariées ; les autres événements sont ignorés
+    keep = is_failure | is_repair
+    codes, hours, is_failure = codes[keep], hours[keep], is_failure[keep]
+
+    # Suppression des répétitions (même type d'événement que le précédent sur la même machine)
+    first_of_machine = np.r_[True, codes[1:] != codes[:-1]]
+    changed = first_of_machine | np.r_[True, is_failure[1:] != is_failure[:-1]]
+    codes, hours, is_failure = codes[changed], hours[changed], is_failure[changed]
+
+    # Une panne est appariée si l'événement suivant est une réparation de la même machine
+    same_next = np.r_[codes[1:] == codes[:-1], False]
+    paired = is_failure & same_next & np.r_[~is_failure[1:], False]
+    failure_index = np.flatnonzero(paired)
+    open_index = np.flatnonzero(is_failure & ~paired)
+    down_codes = np.r_[codes[failure_index], codes[open_index]]
+    down_start = np.r_[hours[failure_index], hours[open_index]]
+    down_end = np.r_[hours[failure_index + 1], window_end[codes[open_index]]]
+
+    # Les pannes entièrement hors de la période (bornes start / end) ne sont pas comptées,
+    # les autres intervalles sont limités à la période observée
+    inside = (down_start <= window_end[down_codes]) & (down_end >= window_start[down_codes])
+    down_codes, down_start, down_end = down_codes[inside], down_start[inside], down_end[inside]
+    down_start = np.maximum(down_start, window_start[down_codes])
+    down_end = np.minimum(down_end, window_end[down_codes])
+    return down_codes, names, down_start, down_end, window_start, window_end
+
+
+# Fonction pour calculer, par machine, le temps de fonctionnement, le temps d'arrêt, le nombre de pannes,
+# la disponibilité, le MTBF et le MTTR à partir d'un journal brut d'événements (réductions par segment)
+# production : nombre de produits fabriqués par machine (dictionnaire ou Series), facultatif
+def machine_reliability(events, machine=MACHINE, timestamp=TIMESTAMP, event=EVENT, start=None, end=None,
+                        production=None, max_capacity=None):
+    codes, names, down_start, down_end, window_start, window_end = pair_events(
+        events[machine], events[timestamp], events[event], start, end)
+    count = len(names)
+    failures = np.bincount(codes, minlength=count)
+    downtime = np.bincount(codes, weights=np.maximum(down_end - down_start, 0.0), minlength=count)
+    period = np.maximum(window_end - window_start, 0.0)
+    uptime = np.maximum(period - downtime, 0.0)
+
+    result = pd.DataFrame({
+        TIME: uptime,
+        PRODUCTION: pd.Series(production, dtype=float).reindex(names).fillna(0).to_numpy()
+        if production is not None else np.zeros(count),
+        DOWNTIME: downtime,
+        FAILURES: failures,
+    }, index=pd.Index(names, name=machine))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result[AVAILABILITY] = np.where(period > 0, uptime / period, 1.0)
+    production_rate, mtbf, mttr = kpis_from_sums(uptime, result[PRODUCTION], downtime, failures, max_capacity)
+    result['Taux de Production'] = production_rate
+    result['MTBF'] = mtbf
+    result['MTTR'] = mttr
+    return result
+
+
+# Fonction pour calculer les KPI affichés par les tableaux de bord (taux de production, MTBF, MTTR)
+# sur l'ensemble des machines d'un journal d'événements
+def event_kpis(events, max_capacity=None, **options):
+    return calculate_kpis(machine_reliability(events, **options), max_capacity)
+
+
+# Référence en Python pur (boucle sur les événements) pour vérifier le résultat vectorisé
+def _reference(events):
+    rows = {}
+    for machine_name, group in events.sort_values([MACHINE, TIMESTAMP]).groupby(MACHINE, sort=False):
+        hours = _to_hours(group[TIMESTAMP])
+        kinds = group[EVENT].str.lower().to_numpy()
+        failures, downtime, open_since = 0, 0.0, None
+        for hour, kind in zip(hours, kinds):
+            if kind in FAILURE_EVENTS and open_since is None:
+                open_since = hour
+                failures += 1
+            elif kind in REPAIR_EVENTS and open_since is not None:
+                downtime += hour - open_since
+                open_since = None
+        if open_since is not None:
+            downtime += hours.max() - open_since
+        rows[machine_name] = (failures, downtime, hours.max() - hours.min() - downtime)
+    return rows
+
+
+# Fonction pour générer un journal synthétique (size événements : pannes et réparations mélangées)
+def synthetic_events(size, machines=500, seed=0):
+    rng = np.random.default_rng(seed)
+    half = size // 2
+    machine_codes = rng.integers(0, machines, half)
+    failure_time = rng.uniform(0, 365 * 24 * 3600, half)
+    repair_time = failure_time + rng.exponential(2 * 3600, half)
+    return pd.DataFrame({
+        MACHINE: np.r_[machine_codes, machine_codes],
+        TIMESTAMP: np.r_[failure_time, repair_time],
+        EVENT: np.r_[np.full(half, 'panne'), np.full(half, 'réparation')],
+    }).sample(frac=1, random_state=seed)
+
+
+# Test de performance : journal synthétique de plusieurs millions d'événements
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="MTBF / MTTR par machine à partir d'un journal d'événements")
+    parser.add_argument('--events', type=float, default=5e6)
+    parser.add_argument('--machines', type=int, default=500)
+    args = parser.parse_args()
+
+    log = synthetic_events(int(args.events), args.machines)
+
+    start = time.perf_counter()
+    table = machine_reliability(log)
+    elapsed = time.perf_counter() - start
+    print(f"{len(log):,} événements, {len(table)} machines : {elapsed:.2f} s ({len(log) / elapsed:,.0f} événements/s)")
+    print(table.head())
+    print("KPI globaux (taux, MTBF, MTTR) :", event_kpis(log))
+
+    sample = log[log[MACHINE] < 5]
+    reference = _reference(sample)
+    check = machine_reliability(sample)
+    for machine_name, (failures, downtime, uptime) in reference.items():
+        row = check.loc[machine_name]
+        assert row[FAILURES] == failures and np.isclose(row[DOWNTIME], downtime) and np.isclose(row[TIME], uptime)
+    print(f"résultats identiques à la boucle Python sur {len(sample):,} événements")
+
+    # Cellules vides ignorées ; seules les pannes de la période demandée sont comptées
+    window_log = pd.DataFrame({
+        MACHINE: ['A', 'A', 'A', 'A', None, 'A', 'A'],
+        TIMESTAMP: [0, 3600, 10 * 3600, 12 * 3600, 11 * 3600, np.nan, 30 * 3600],
+        EVENT: ['panne', 'réparation', 'panne', 'réparation', 'panne', 'panne', None],
+    })
+    row = machine_reliability(window_log, start=5 * 3600, end=20 * 3600).loc['A']
+    assert row[FAILURES] == 1 and np.isclose(row[DOWNTIME], 2) and np.isclose(row[TIME], 13)
+    print("lignes incomplètes et pannes hors période écartées")
@@ -0,0 +1,247 @@
+import threading
+from array import array
+from collections import deque
+
+FIFO = 'FIFO'
+LIFO = 'LIFO'
+
+
+# Stock lot (one stock entry); __slots__ avoids a per-lot __dict__
+class Lot:
+    __slots__ = ('quantity', 'cost', 'date')
+
+    def __init__(self, quantity, cost, date):
+        self.quantity = quantity
+        self.cost = cost
+        self.date = date
+
+
+# Running totals of one item: quantity, value of the remaining lots and weighted average unit cost (CUMP)
+class ItemTotals:
+    __slots__ = ('quantity', 'value', 'average_cost')
+
+    def __init__(self):
+        self.quantity = 0
+        self.value = 0.0
+        self.average_cost = 0.0
+
+
+# Stock ledger: for each item, a deque of lots in entry order
+# FIFO consumes from the left (oldest lots), LIFO from the right (newest lots)
+# Totals per item and for the whole stock are updated on every movement, so valuation reads are O(1)
+class StockLedger:
+    def __init__(self):
+        self._lots = {}
+        self._totals = {}
+        self._quantity = 0
+        self._value = 0.0
+        self._cump_value = 0.0
+        # The ledger is shared by every Streamlit session thread
+        self._lock = threading.Lock()
+
+    # Add a lot to the stock
+    def add(self, item, quantity, cost, date=None):
+        if quantity <= 0:
+            raise ValueError("La quantité ajoutée doit être positive.")
+        with self._lock:
+            lots = self._lots.get(item)
+            if lots is None:
+                lots = self._lots[item] = deque()
+                self._totals[item] = ItemTotals()
+            lots.append(Lot(quantity, cost, date))
+            totals = self._totals[item]
+            entry_value = quantity * cost
+            totals.average_cost = (totals.quantity * totals.average_cost + entry_value) / (totals.quantity + quantity)
+            totals.quantity += quantity
+            totals.value += entry_value
+            self._quantity += quantity
+            self._value += entry_value
+            self._cump_value += entry_value
+
+    # Issue a quantity, possibly spanning several lots
+    # Returns the consumed (quantity, unit cost) pairs; nothing is issued if the stock is insufficient
+    def issue(self, item, quantity, date=None, method=FIFO):
+        if quantity <= 0:
+            raise ValueError("La quantité sortie doit être positive.")
+        with self._lock:
+            totals = self._totals.get(item)
+            available = totals.quantity if totals is not None else 0
+            if quantity > available:
+                raise ValueError(f"Stock insuffisant pour {item} : {available} disponible(s), {quantity} demandé(s).")
+            lots = self._lots[item]
+            take = lots.popleft if method == FIFO else lots.pop
+            peek = 0 if method == FIFO else -1
+            consumed = []
+            issued_value = 0.0
+            remaining = quantity
+            while remaining > 0:
+                lot = lots[peek]
+                if lot.quantity <= remaining:
+                    take()
+                    consumed.append((lot.quantity, lot.cost))
+                    issued_value += lot.quantity * lot.cost
+                    remaining -= lot.quantity
+                else:
+                    lot.quantity -= remaining
+                    consumed.append((remaining, lot.cost))
+                    issued_value += remaining * lot.cost
+                    remaining = 0
+            # CUMP: issues are valued at the current weighted average cost, which they do not change
+            self._cump_value -= quantity * totals.average_cost
+            self._quantity -= quantity
+            self._value -= issued_value
+            totals.quantity -= quantity
+            totals.value -= issued_value
+            if not lots:
+                del self._lots[item]
+                del self._totals[item]
+        return consumed
+
+    def quantity(self, item=None):
+        if item is None:
+            return self._quantity
+        totals = self._totals.get(item)
+        return totals.quantity if totals is not None else 0
+
+    # Value of the remaining lots (the cost of the lots actually left after FIFO/LIFO issues)
+    def value(self, item=None):
+        if item is None:
+            return self._value
+        totals = self._totals.get(item)
+        return totals.value if totals is not None else 0.0
+
+    # Weighted average unit cost (CUMP) of an item, or of the whole stock
+    def average_cost(self, item=None):
+        if item is None:
+            return self._cump_value / self._quantity if self._quantity else 0.0
+        totals = self._totals.get(item)
+        return totals.average_cost if totals is not None else 0.0
+
+    # Stock value when every issue is valued at the weighted average cost (CUMP)
+    def cump_value(self, item=None):
+        if item is None:
+            return self._cump_value
+        totals = self._totals.get(item)
+        return totals.quantity * totals.average_cost if totals is not None else 0.0
+
+    def items(self):
+        return list(self._lots)
+
+    # Pickling support for snapshots: lots are stored column-wise (one array per field and item),
+    # which is much faster to save and load than one object per lot; the lock is recreated on load
+    def __getstate__(self):
+        lots = {}
+        for item, item_lots in self._lots.items():
+            quantities = [lot.quantity for lot in item_lots]
+            if all(type(quantity) is int for quantity in quantities):
+                quantities = array('q', quantities)
+            else:
+                quantities = array('d', quantities)
+            costs = array('d', [lot.cost for lot in item_lots])
+            dates = [lot.date for lot in item_lots]
+            lots[item] = (quantities, costs, None if all(date is None for date in dates) else dates)
+        totals = {item: (t.quantity, t.value, t.average_cost) for item, t in self._totals.items()}
+        return {'lots': lots, 'totals': totals, 'global': (self._quantity, self._value, self._cump_value)}
+
+    def __setstate__(self, state):
+        self._lots = {}
+        for item, (quantities, costs, dates) in state['lots'].items():
+            if dates is None:
+                dates = [None] * len(quantities)
+            self._lots[item] = deque(map(Lot, quantities.tolist(), costs.tolist(), dates))
+        self._totals = {}
+        for item, (quantity, value, average_cost) in state['totals'].items():
+            totals = self._totals[item] = ItemTotals()
+            totals.quantity, totals.value, totals.average_cost = quantity, value, average_cost
+        self._quantity, self._value, self._cump_value = state['global']
+        self._lock = threading.Lock()
+
+    # Per-item totals, for display
+    def summary(self):
+        return [{'Item': item, 'Quantity': totals.quantity, 'Value': totals.value, 'CUMP': totals.average_cost}
+                for item, totals in self._totals.items()]
+
+    # Check the running totals against a full recompute from the lots (tolerance is relative)
+    # Returns the mismatches found ({name: (running, recomputed)}); they are corrected when fix is True
+    def reconcile(self, tolerance=1e-6, fix=True):
+        with self._lock:
+            mismatches = {}
+            quantity = value = cump_value = 0
+            for item, lots in self._lots.items():
+                totals = self._totals[item]
+                item_quantity = sum(lot.quantity for lot in lots)
+                item_value = sum(lot.quantity * lot.cost for lot in lots)
+                if item_quantity != totals.quantity:
+                    mismatches[f"{item} quantity"] = (totals.quantity, item_quantity)
+                if abs(item_value - totals.value) > tolerance * max(1.0, abs(item_value)):
+                    mismatches[f"{item} value"] = (totals.value, item_value)
+                if fix:
+                    totals.quantity = item_quantity
+                    totals.value = item_value
+                quantity += item_quantity
+                value += item_value
+                cump_value += item_quantity * totals.average_cost
+            for name, running, recomputed in (('quantity', self._quantity, quantity), ('value', self._value, value),
+                                              ('cump value', self._cump_value, cump_value)):
+                if abs(running - recomputed) > tolerance * max(1.0, abs(recomputed)):
+                    mismatches[name] = (running, recomputed)
+            if fix:
+                self._quantity, self._value, self._cump_value = quantity, value, cump_value
+            return mismatches
+
+    # Iterate over the remaining (item, lot) pairs, in entry order per item
+    def lots(self, item=None):
+        items = [item] if item is not None else list(self._lots)
+        for name in items:
+            for lot in self._lots.get(name, ()):
+                yield name, lot
+
+    # Remaining stock rows, in the former stock_data format (for display)
+    def records(self):
+        return [{'Item': item, 'Quantity': lot.quantity, 'Cost': lot.cost, 'Date': lot.date} for item, lot in self.lots()]
+
+
+# Benchmark: random stock entries and issues over many items
+if __name__ == '__main__':
+    import argparse
+    import random
+    import time
+
+    parser = argparse.ArgumentParser(description="Performance du registre de stock")
+    parser.add_argument('--movements', type=int, default=1_000_000)
+    parser.add_argument('--items', type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    movements = []
+    for _ in range(args.movements):
+        item = f"article-{rng.randrange(args.items)}"
+        if rng.random() < 0.55:
+            movements.append((True, item, rng.randint(1, 100), rng.uniform(1, 50)))
+        else:
+            movements.append((False, item, rng.randint(1, 150), rng.choice((FIFO, LIFO))))
+
+    ledger = StockLedger()
+    issued = refused = 0
+    start = time.perf_counter()
+    for is_entry, item, quantity, extra in movements:
+        if is_entry:
+            ledger.add(item, quantity, extra)
+        elif quantity <= ledger.quantity(item):
+            ledger.issue(item, quantity, method=extra)
+            issued += 1
+        else:
+            refused += 1
+    elapsed = time.perf_counter() - start
+    remaining_lots = sum(1 for _ in ledger.lots())
+    print(f"{args.movements} mouvements en {elapsed:.2f} s ({args.movements / elapsed:,.0f} mouvements/s), "
+          f"{issued} sorties, {refused} refusées, {remaining_lots} lots restants")
+
+    start = time.perf_counter()
+    for _ in range(100_000):
+        ledger.value(), ledger.cump_value(), ledger.average_cost()
+    read_time = (time.perf_counter() - start) / 100_000
+    start = time.perf_counter()
+    mismatches = ledger.reconcile(fix=False)
+    print(f"lecture de la valorisation : {read_time * 1e6:.2f} µs, "
+          f"réconciliation complète : {time.perf_counter() - start:.3f} s, écarts : {mismatches}")
@@ -0,0 +1,191 @@
+import datetime
+import os
+import pickle
+import sqlite3
+import threading
+from stock_ledger import StockLedger, FIFO
+
+# Default path of the stock database (append-only movement log + ledger snapshots)
+STOCK_DB_PATH = os.environ.get('STOCK_DB_PATH', 'stock.db')
+
+# A snapshot is taken every SNAPSHOT_EVERY movements, so startup replays at most that many
+SNAPSHOT_EVERY = 50_000
+# Number of snapshots kept (older ones are deleted)
+SNAPSHOTS_KEPT = 2
+
+ADD = 'add'
+ISSUE = 'issue'
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS stock_movements (
+            seq INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            item TEXT NOT NULL,
+            quantity REAL NOT NULL,
+            cost REAL,
+            method TEXT,
+            date TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS stock_snapshots (
+            seq INTEGER PRIMARY KEY,
+            payload BLOB NOT NULL)''',
+]
+INSERT_MOVEMENT_SQL = "INSERT INTO stock_movements (kind, item, quantity, cost, method, date) VALUES (?, ?, ?, ?, ?, ?)"
+
+
+def _date_to_text(date):
+    return date.isoformat() if hasattr(date, 'isoformat') else date
+
+
+def _text_to_date(text):
+    if text is None:
+        return None
+    try:
+        return datetime.date.fromisoformat(text)
+    except ValueError:
+        return text
+
+
+# Ledger backed by an append-only SQLite log of movements
+# Startup loads the latest snapshot and replays only the movements logged after it
+class PersistentLedger:
+    def __init__(self, path=None, snapshot_every=SNAPSHOT_EVERY):
+        self.path = path or STOCK_DB_PATH
+        self.snapshot_every = snapshot_every
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            for statement in SCHEMA:
+                self._conn.execute(statement)
+        # Movements are applied and logged under one lock so the log order matches the ledger
+        self._lock = threading.Lock()
+        self.ledger, self._seq, self._snapshot_seq, self.replayed = self._load()
+
+    def _load(self):
+        row = self._conn.execute("SELECT seq, payload FROM stock_snapshots ORDER BY seq DESC LIMIT 1").fetchone()
+        if row is None:
+            ledger, snapshot_seq = StockLedger(), 0
+        else:
+            snapshot_seq, payload = row
+            ledger = pickle.loads(payload)
+        seq = snapshot_seq
+        replayed = 0
+        cursor = self._conn.execute(
+            "SELECT seq, kind, item, quantity, cost, method, date FROM stock_movements WHERE seq > ? ORDER BY seq",
+            (snapshot_seq,))
+        for seq, kind, item, quantity, cost, method, date in cursor:
+            if kind == ADD:
+                ledger.add(item, quantity, cost, _text_to_date(date))
+            else:
+                ledger.issue(item, quantity, _text_to_date(date), method)
+            replayed += 1
+        return ledger, seq, snapshot_seq, replayed
+
+    # Add a lot to the stock and log the movement
+    def add(self, item, quantity, cost, date=None):
+        with self._lock:
+            self.ledger.add(item, quantity, cost, date)
+            self._log([(ADD, item, quantity, cost, None, _date_to_text(date))])
+
+    # Issue a quantity and log the movement (nothing is logged if the issue is refused)
+    def issue(self, item, quantity, date=None, method=FIFO):
+        with self._lock:
+            consumed = self.ledger.issue(item, quantity, date, method)
+            self._log([(ISSUE, item, quantity, None, method, _date_to_text(date))])
+        return consumed
+
+    # Apply and log many movements in a single transaction (bulk loads, benchmarks)
+    # movements: (ADD, item, quantity, cost, date) or (ISSUE, item, quantity, method, date)
+    def apply_many(self, movements):
+        with self._lock:
+            rows = []
+            try:
+                for kind, item, quantity, extra, date in movements:
+                    if kind == ADD:
+                        self.ledger.add(item, quantity, extra, date)
+                        rows.append((ADD, item, quantity, extra, None, _date_to_text(date)))
+                    else:
+                        self.ledger.issue(item, quantity, date, extra)
+                        rows.append((ISSUE, item, quantity, None, extra, _date_to_text(date)))
+                    if self._seq + len(rows) - self._snapshot_seq >= self.snapshot_every:
+                        self._log(rows)
+                        rows = []
+            finally:
+                # Movements already applied to the ledger are logged even if a later one is refused
+                if rows:
+                    self._log(rows)
+
+    def _log(self, rows):
+        with self._conn:
+            self._conn.executemany(INSERT_MOVEMENT_SQL, rows)
+        self._seq += len(rows)
+        if self._seq - self._snapshot_seq >= self.snapshot_every:
+            self._snapshot()
+
+    def _snapshot(self):
+        payload = pickle.dumps(self.ledger, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO stock_snapshots (seq, payload) VALUES (?, ?)",
+                               (self._seq, payload))
+            self._conn.execute("DELETE FROM stock_snapshots WHERE seq NOT IN "
+                               "(SELECT seq FROM stock_snapshots ORDER BY seq DESC LIMIT ?)", (SNAPSHOTS_KEPT,))
+        self._snapshot_seq = self._seq
+
+    # Take a snapshot now (e.g. before a planned restart)
+    def snapshot(self):
+        with self._lock:
+            self._snapshot()
+
+    def movement_count(self):
+        return self._seq
+
+    def close(self):
+        self._conn.close()
+
+
+# Benchmark: build a log of N movements, then measure cold start (snapshot load + tail replay)
+if __name__ == '__main__':
+    import argparse
+    import random
+    import tempfile
+    import time
+
+    parser = argparse.ArgumentParser(description="Cold start of the persistent stock ledger")
+    parser.add_argument('--movements', type=int, default=10_000_000)
+    parser.add_argument('--items', type=int, default=1000)
+    parser.add_argument('--path', help="database path (default: temporary file)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.path or os.path.join(tmp, 'stock.db')
+        store = PersistentLedger(path)
+        rng = random.Random(0)
+        stock = {}
+        chunk = []
+        start = time.perf_counter()
+        for _ in range(args.movements):
+            item = f"article-{rng.randrange(args.items)}"
+            quantity = rng.randint(1, 100)
+            if rng.random() < 0.5 or stock.get(item, 0) < quantity:
+                chunk.append((ADD, item, quantity, round(rng.uniform(1, 50), 2), None))
+                stock[item] = stock.get(item, 0) + quantity
+            else:
+                chunk.append((ISSUE, item, quantity, rng.choice((FIFO, 'LIFO')), None))
+                stock[item] -= quantity
+            if len(chunk) == 100_000:
+                store.apply_many(chunk)
+                chunk = []
+        store.apply_many(chunk)
+        build_time = time.perf_counter() - start
+        # Leave a tail after the last snapshot, as after an ordinary run
+        for _ in range(SNAPSHOT_EVERY // 2):
+            store.add('article-0', 1, 1.0)
+        store.close()
+        print(f"journal de {store.movement_count()} mouvements écrit en {build_time:.1f} s")
+
+        start = time.perf_counter()
+        store = PersistentLedger(path)
+        elapsed = time.perf_counter() - start
+        print(f"démarrage à froid : {elapsed:.3f} s ({store.replayed} mouvements rejoués après le dernier instantané), "
+              f"valeur du stock {store.ledger.value():,.2f}, écarts : {store.ledger.reconcile(fix=False)}")
+        store.close()
@@ -0,0 +1,727 @@
+import numbers
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+import pandas as pd
+import numpy as np
+from kpi import kpis_from_sums, SUM_COLUMNS
+from linear_forecast import forecast_from_stats
+from profiling import timed
+
+# Chemin par défaut de la base de données SQLite
+DB_PATH = 'data.db'
+
+# Noms des colonnes affichées dans les applications
+COLUMNS = ['id', 'Temps de Production', 'Nombre de Produits Fabriqués', 'Temps d\'Arrêt', 'Nombre de Pannes',
+           'Horodatage']
+TOTALS_COLUMNS = ['Nombre de Lignes', 'Temps de Production', 'Nombre de Produits Fabriqués', 'Temps d\'Arrêt',
+                  'Nombre de Pannes', 'Temps de Production Max']
+
+# Requêtes SQL (chaînes constantes : sqlite3 garde les instructions préparées en cache par connexion)
+# L'horodatage est stocké en secondes depuis l'epoch (UTC) pour pouvoir regrouper par tranche en SQL
+INSERT_SQL = ("INSERT INTO production_data (temps_production, nombre_produits, temps_arret, nombre_pannes, horodatage) "
+              "VALUES (?, ?, ?, ?, ?)")
+SELECT_ALL_SQL = ("SELECT id, temps_production, nombre_produits, temps_arret, nombre_pannes, horodatage "
+                  "FROM production_data")
+SELECT_TOTALS_SQL = ("SELECT nombre_lignes, temps_production, nombre_produits, temps_arret, nombre_pannes, "
+                     "temps_production_max FROM production_totals WHERE id = 1")
+RECOMPUTE_TOTALS_SQL = '''SELECT COUNT(*), COALESCE(SUM(temps_production), 0), COALESCE(SUM(nombre_produits), 0),
+                                 COALESCE(SUM(temps_arret), 0), COALESCE(SUM(nombre_pannes), 0), MAX(temps_production)
+                          FROM production_data'''
+# Lectures incrémentales : sommes des lignes ajoutées après un identifiant, ou totaux et dernier identifiant
+# lus dans la même requête (donc dans le même instantané de la base)
+SELECT_DELTA_SQL = '''SELECT COUNT(*), COALESCE(SUM(temps_production), 0), COALESCE(SUM(nombre_produits), 0),
+                             COALESCE(SUM(temps_arret), 0), COALESCE(SUM(nombre_pannes), 0), MAX(id)
+                      FROM production_data WHERE id > ?'''
+SELECT_TOTALS_LAST_ID_SQL = ("SELECT nombre_lignes, temps_production, nombre_produits, temps_arret, nombre_pannes, "
+                             "(SELECT MAX(id) FROM production_data) FROM production_totals WHERE id = 1")
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS production_data (
+            id INTEGER PRIMARY KEY,
+            temps_production REAL,
+            nombre_produits INTEGER,
+            temps_arret REAL,
+            nombre_pannes INTEGER,
+            horodatage INTEGER)''',
+    # Totaux cumulés (une seule ligne, id = 1) maintenus par triggers à chaque insertion/suppression
+    '''CREATE TABLE IF NOT EXISTS production_totals (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            nombre_lignes INTEGER NOT NULL DEFAULT 0,
+            temps_production REAL NOT NULL DEFAULT 0,
+            nombre_produits INTEGER NOT NULL DEFAULT 0,
+            temps_arret REAL NOT NULL DEFAULT 0,
+            nombre_pannes INTEGER NOT NULL DEFAULT 0,
+            temps_production_max REAL)''',
+    '''CREATE TRIGGER IF NOT EXISTS production_totals_insert
+            AFTER INSERT ON production_data
+            BEGIN
+                UPDATE production_totals SET
+                    nombre_lignes = nombre_lignes + 1,
+                    temps_production = temps_production + COALESCE(NEW.temps_production, 0),
+                    nombre_produits = nombre_produits + COALESCE(NEW.nombre_produits, 0),
+                    temps_arret = temps_arret + COALESCE(NEW.temps_arret, 0),
+                    nombre_pannes = nombre_pannes + COALESCE(NEW.nombre_pannes, 0),
+                    -- MAX(a, b) vaut NULL si l'un des deux est NULL : une ligne sans temps garde le maximum
+                    temps_production_max = CASE WHEN NEW.temps_production IS NULL THEN temps_production_max
+                        ELSE MAX(COALESCE(temps_production_max, NEW.temps_production), NEW.temps_production) END
+                WHERE id = 1;
+            END''',
+    '''CREATE TRIGGER IF NOT EXISTS production_totals_delete
+            AFTER DELETE ON production_data
+            BEGIN
+                UPDATE production_totals SET
+                    nombre_lignes = nombre_lignes - 1,
+                    temps_production = temps_production - COALESCE(OLD.temps_production, 0),
+                    nombre_produits = nombre_produits - COALESCE(OLD.nombre_produits, 0),
+                    temps_arret = temps_arret - COALESCE(OLD.temps_arret, 0),
+                    nombre_pannes = nombre_pannes - COALESCE(OLD.nombre_pannes, 0),
+                    temps_production_max = (SELECT MAX(temps_production) FROM production_data)
+                WHERE id = 1;
+            END''',
+    # Statistiques suffisantes de la tendance linéaire (nombre de produits en fonction du rang de la ligne),
+    # mises à jour à chaque insertion (algorithme de Welford pondéré, avec facteur d'oubli facultatif) :
+    # la prévision de make_forecast est toujours à jour sans réentraînement
+    '''CREATE TABLE IF NOT EXISTS production_trend (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            oubli REAL NOT NULL DEFAULT 1.0,
+            prochain_x INTEGER NOT NULL DEFAULT 0,
+            poids REAL NOT NULL DEFAULT 0,
+            moyenne_x REAL NOT NULL DEFAULT 0,
+            moyenne_y REAL NOT NULL DEFAULT 0,
+            cxx REAL NOT NULL DEFAULT 0,
+            cxy REAL NOT NULL DEFAULT 0,
+            cyy REAL NOT NULL DEFAULT 0,
+            perime INTEGER NOT NULL DEFAULT 0)''',
+    # Dans un UPDATE, toutes les expressions lisent les anciennes valeurs de la ligne :
+    # poids' = oubli * poids + 1, moyenne' = moyenne + (v - moyenne) / poids',
+    # c' = oubli * c + (x - moyenne_x) * (y - moyenne_y') (co-moments centrés)
+    '''CREATE TRIGGER IF NOT EXISTS production_trend_insert
+            AFTER INSERT ON production_data
+            WHEN NEW.nombre_produits IS NOT NULL
+            BEGIN
+                UPDATE production_trend SET
+                    prochain_x = prochain_x + 1,
+                    poids = oubli * poids + 1,
+                    moyenne_x = moyenne_x + (prochain_x - moyenne_x) / (oubli * poids + 1),
+                    moyenne_y = moyenne_y + (NEW.nombre_produits - moyenne_y) / (oubli * poids + 1),
+                    cxx = oubli * cxx + (prochain_x - moyenne_x) * (prochain_x - moyenne_x) * (1 - 1 / (oubli * poids + 1)),
+                    cxy = oubli * cxy + (prochain_x - moyenne_x) * (NEW.nombre_produits - moyenne_y) * (1 - 1 / (oubli * poids + 1)),
+                    cyy = oubli * cyy + (NEW.nombre_produits - moyenne_y) * (NEW.nombre_produits - moyenne_y) * (1 - 1 / (oubli * poids + 1))
+                WHERE id = 1;
+            END''',
+    # Ligne sans nombre de produits : elle occupe un rang (comme dans get_data) sans entrer dans l'ajustement ;
+    # l'oubli s'applique quand même, le poids d'une ligne dépendant de son écart de rang avec la dernière
+    # (comme dans _rebuild_trend). Les moyennes pondérées ne changent pas
+    '''CREATE TRIGGER IF NOT EXISTS production_trend_insert_null
+            AFTER INSERT ON production_data
+            WHEN NEW.nombre_produits IS NULL
+            BEGIN
+                UPDATE production_trend SET
+                    prochain_x = prochain_x + 1,
+                    poids = oubli * poids,
+                    cxx = oubli * cxx,
+                    cxy = oubli * cxy,
+                    cyy = oubli * cyy
+                WHERE id = 1;
+            END''',
+    # Une suppression décale les rangs : les statistiques sont recalculées à la lecture suivante
+    '''CREATE TRIGGER IF NOT EXISTS production_trend_delete
+            AFTER DELETE ON production_data
+            BEGIN
+                UPDATE production_trend SET perime = 1 WHERE id = 1;
+            END''',
+]
+
+# Index créés après la migration (les anciennes bases n'ont pas encore la colonne horodatage)
+INDEXES = [
+    # Index composites (colonne, id) pour le tri et la pagination par clé (keyset) de la vue paginée
+    "CREATE INDEX IF NOT EXISTS idx_production_temps_production ON production_data (temps_production, id)",
+    "CREATE INDEX IF NOT EXISTS idx_production_nombre_produits ON production_data (nombre_produits, id)",
+    "CREATE INDEX IF NOT EXISTS idx_production_temps_arret ON production_data (temps_arret, id)",
+    "CREATE INDEX IF NOT EXISTS idx_production_nombre_pannes ON production_data (nombre_pannes, id)",
+    # Sert aussi aux requêtes de KPI par tranche de temps (filtre de plage sur l'horodatage)
+    "CREATE INDEX IF NOT EXISTS idx_production_horodatage ON production_data (horodatage, id)",
+]
+
+# Nombre maximal de connexions ouvertes par fichier de base (pool partagé par tous les threads)
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+
+# Pools de connexions par fichier de base : chaque rerun Streamlit tourne dans un nouveau thread,
+# les connexions (et leur cache d'instructions préparées) sont donc partagées plutôt que liées à un thread
+_pools = {}
+_pools_lock = threading.Lock()
+_schema_lock = threading.Lock()
+_initialized_paths = set()
+
+# Fonction pour supprimer un trigger d'une ancienne version (sa définition ne contient pas marker) ;
+# il est recréé par SCHEMA. Renvoie True si la table qu'il maintient doit être reconstruite
+def _drop_stale_trigger(conn, name, marker):
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,)).fetchone()
+    if row is None or marker in row[0]:
+        return False
+    conn.execute(f"DROP TRIGGER {name}")
+    return True
+
+# Fonction pour créer le schéma une seule fois par fichier de base
+def _init_schema(conn, path):
+    with _schema_lock:
+        if path in _initialized_paths:
+            return
+        with conn:
+            # Anciennes bases : le maximum du temps de production était remis à NULL par une ligne sans temps,
+            # et le trigger des lignes sans nombre de produits n'appliquait pas l'oubli
+            stale_totals = _drop_stale_trigger(conn, 'production_totals_insert', 'CASE WHEN')
+            stale_trend = _drop_stale_trigger(conn, 'production_trend_insert_null', 'oubli')
+            for statement in SCHEMA:
+                conn.execute(statement)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(production_data)")]
+            if 'horodatage' not in columns:
+                conn.execute("ALTER TABLE production_data ADD COLUMN horodatage INTEGER")
+            for statement in INDEXES:
+                conn.execute(statement)
+            if stale_totals or conn.execute("SELECT 1 FROM production_totals WHERE id = 1").fetchone() is None:
+                _rebuild_totals(conn)
+            if stale_trend or conn.execute("SELECT 1 FROM production_trend WHERE id = 1").fetchone() is None:
+                _rebuild_trend(conn)
+        _initialized_paths.add(path)
+
+# Fonction pour ouvrir une connexion (WAL, attente en cas de verrou) ; utilisable depuis n'importe quel thread,
+# le pool garantissant qu'un seul thread s'en sert à la fois
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=30, cached_statements=256, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    _init_schema(conn, path)
+    return conn
+
+# Pool borné de connexions à un fichier de base : une connexion libre est réutilisée, une nouvelle est ouverte
+# tant que la limite n'est pas atteinte, sinon on attend qu'une connexion soit rendue
+class ConnectionPool:
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def acquire(self):
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return _connect(self.path)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        # Une transaction laissée ouverte (erreur en cours de lecture) n'est pas transmise à l'utilisateur suivant
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+        self._slots.release()
+
+    # Ferme les connexions libres (celles en cours d'utilisation sont fermées à leur retour suivant)
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+def _get_pool(path):
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = ConnectionPool(path)
+        return pool
+
+# Gestionnaire de contexte : emprunte une connexion du pool et la rend en sortie
+#   with connection(path) as conn: ...
+@contextmanager
+def connection(path=None):
+    pool = _get_pool(path or DB_PATH)
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+# Fonction pour fermer les connexions libres d'un fichier de base et oublier son pool
+def close_pool(path=None):
+    with _pools_lock:
+        pool = _pools.pop(path or DB_PATH, None)
+    if pool is not None:
+        pool.close()
+
+# Fonction pour convertir une date (datetime, Timestamp, texte ou epoch) en secondes depuis l'epoch
+def to_epoch(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, numbers.Real):
+        return int(value)
+    timestamp = pd.Timestamp(value)
+    if timestamp is pd.NaT:
+        return None
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return int(timestamp.timestamp())
+
+# Fonction pour ajouter une ligne à la base de données (horodatée maintenant par défaut)
+def add_data(temps_production, nombre_produits, temps_arret, nombre_pannes, horodatage=None, path=None):
+    horodatage = int(time.time()) if horodatage is None else to_epoch(horodatage)
+    with connection(path) as conn, conn:
+        conn.execute(INSERT_SQL, (temps_production, nombre_produits, temps_arret, nombre_pannes, horodatage))
+
+# Fonction pour ajouter plusieurs lignes avec un seul commit par lot
+# (lignes de 4 valeurs, horodatées maintenant, ou de 5 valeurs avec l'horodatage en dernier)
+def add_data_many(rows, batch_size=1000, path=None):
+    now = int(time.time())
+    batch = []
+    count = 0
+    with connection(path) as conn:
+        for row in rows:
+            row = tuple(row)
+            batch.append(row + (now,) if len(row) == 4 else row[:4] + (to_epoch(row[4]),))
+            if len(batch) >= batch_size:
+                with conn:
+                    conn.executemany(INSERT_SQL, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            with conn:
+                conn.executemany(INSERT_SQL, batch)
+            count += len(batch)
+    return count
+
+# Fonction pour récupérer les données de la base de données
+@timed('storage.get_data')
+def get_data(path=None):
+    with connection(path) as conn:
+        rows = conn.execute(SELECT_ALL_SQL).fetchall()
+    return _to_frame(rows)
+
+def _to_frame(rows):
+    data = pd.DataFrame(rows, columns=COLUMNS)
+    data['Horodatage'] = pd.to_datetime(data['Horodatage'], unit='s')
+    return data
+
+# Fonction pour lire les totaux cumulés (coût constant, quelle que soit la taille de la table)
+@timed('storage.get_totals')
+def get_totals(path=None):
+    with connection(path) as conn:
+        row = conn.execute(SELECT_TOTALS_SQL).fetchone()
+    return dict(zip(TOTALS_COLUMNS, row))
+
+# Fonction pour lire les sommes des lignes ajoutées après after_id (parcours de la clé primaire, coût
+# proportionnel aux nouvelles lignes) ; sans after_id, renvoie les totaux cumulés
+# Renvoie (sommes, dernier identifiant lu) : le dernier identifiant sert de curseur pour l'appel suivant
+def get_delta(after_id=None, path=None):
+    with connection(path) as conn:
+        if after_id is None:
+            row = conn.execute(SELECT_TOTALS_LAST_ID_SQL).fetchone()
+        else:
+            row = conn.execute(SELECT_DELTA_SQL, (after_id,)).fetchone()
+    last_id = row[5] if row[5] is not None else (after_id or 0)
+    return dict(zip(TOTALS_COLUMNS[:5], row[:5])), last_id
+
+def _rebuild_totals(conn):
+    conn.execute('''INSERT OR REPLACE INTO production_totals
+                        (id, nombre_lignes, temps_production, nombre_produits, temps_arret, nombre_pannes,
+                         temps_production_max)
+                    SELECT 1, COUNT(*), COALESCE(SUM(temps_production), 0), COALESCE(SUM(nombre_produits), 0),
+                           COALESCE(SUM(temps_arret), 0), COALESCE(SUM(nombre_pannes), 0), MAX(temps_production)
+                    FROM production_data''')
+
+# Fonction pour reconstruire les totaux à partir de la table complète
+def rebuild_totals(path=None):
+    with connection(path) as conn, conn:
+        _rebuild_totals(conn)
+
+# Fonction pour vérifier les totaux cumulés contre un recalcul complet (et les corriger si besoin)
+def check_totals(tolerance=1e-6, path=None):
+    stored = get_totals(path)
+    with connection(path) as conn:
+        expected = dict(zip(TOTALS_COLUMNS, conn.execute(RECOMPUTE_TOTALS_SQL).fetchone()))
+    mismatches = {}
+    for key, value in expected.items():
+        if (value is None) != (stored[key] is None) or (value is not None and abs(value - stored[key]) > tolerance):
+            mismatches[key] = (stored[key], value)
+    if mismatches:
+        rebuild_totals(path)
+    return mismatches
+
+
+# Colonnes de la tendance linéaire en ligne (production_trend)
+TREND_COLUMNS = ['oubli', 'prochain_x', 'poids', 'moyenne_x', 'moyenne_y', 'cxx', 'cxy', 'cyy', 'perime']
+SELECT_TREND_SQL = f"SELECT {', '.join(TREND_COLUMNS)} FROM production_trend WHERE id = 1"
+
+# Fonction pour recalculer la tendance sur tout l'historique (vectorisé, lu par blocs) ; poids oubli^(n-1-x)
+def _rebuild_trend(conn, forgetting=None):
+    if forgetting is None:
+        row = conn.execute("SELECT oubli FROM production_trend WHERE id = 1").fetchone()
+        forgetting = row[0] if row else 1.0
+    cursor = conn.execute("SELECT nombre_produits FROM production_data ORDER BY id")
+    chunks = []
+    while True:
+        rows = cursor.fetchmany(100_000)
+        if not rows:
+            break
+        chunks.append(np.array([row[0] for row in rows], dtype=float))
+    y = np.concatenate(chunks) if chunks else np.empty(0)
+    x = np.arange(len(y), dtype=float)
+    valid = ~np.isnan(y)
+    x, y = x[valid], y[valid]
+    weights = np.power(forgetting, len(valid) - 1 - x)
+    weight = weights.sum()
+    mean_x = (weights * x).sum() / weight if weight > 0 else 0.0
+    mean_y = (weights * y).sum() / weight if weight > 0 else 0.0
+    conn.execute('''INSERT OR REPLACE INTO production_trend
+                        (id, oubli, prochain_x, poids, moyenne_x, moyenne_y, cxx, cxy, cyy, perime)
+                    VALUES (1, ?, ?, ?, ?, ?, ?, ?, ?, 0)''',
+                 (forgetting, len(valid), float(weight), float(mean_x), float(mean_y),
+                  float((weights * (x - mean_x) ** 2).sum()), float((weights * (x - mean_x) * (y - mean_y)).sum()),
+                  float((weights * (y - mean_y) ** 2).sum())))
+
+# Fonction pour reconstruire la tendance (et changer le facteur d'oubli : 1 = tout l'historique pèse autant,
+# 0,99 = le poids d'une ligne est divisé par e toutes les 100 lignes)
+def rebuild_trend(forgetting=None, path=None):
+    if forgetting is not None and not 0 < forgetting <= 1:
+        raise ValueError("Le facteur d'oubli doit être compris entre 0 (exclu) et 1.")
+    with connection(path) as conn, conn:
+        _rebuild_trend(conn, forgetting)
+
+# Fonction pour lire les statistiques de la tendance (recalculées seulement après une suppression)
+def get_trend(path=None):
+    with connection(path) as conn:
+        trend = dict(zip(TREND_COLUMNS, conn.execute(SELECT_TREND_SQL).fetchone()))
+        if trend['perime']:
+            with conn:
+                _rebuild_trend(conn)
+            trend = dict(zip(TREND_COLUMNS, conn.execute(SELECT_TREND_SQL).fetchone()))
+    return trend
+
+# Fonction pour prévoir le nombre de produits de la ligne suivante (horizon 1), comme make_forecast sur get_data,
+# mais en temps constant à partir des statistiques tenues à jour par trigger
+# Renvoie (prévision, borne basse, borne haute)
+@timed('storage.get_trend_forecast')
+def get_trend_forecast(horizon=1, confidence=0.95, path=None):
+    trend = get_trend(path)
+    return forecast_from_stats(trend['poids'], trend['moyenne_x'], trend['moyenne_y'], trend['cxx'], trend['cxy'],
+                               trend['cyy'], trend['prochain_x'] - 1 + horizon, confidence)
+
+
+# Colonnes triables de la vue paginée (libellé affiché -> colonne SQL indexée)
+SORT_COLUMNS = {
+    'id': 'id',
+    'Temps de Production': 'temps_production',
+    'Nombre de Produits Fabriqués': 'nombre_produits',
+    'Temps d\'Arrêt': 'temps_arret',
+    'Nombre de Pannes': 'nombre_pannes',
+    'Horodatage': 'horodatage',
+}
+
+# Fonction pour lire une page de données par pagination sur clé (keyset) plutôt qu'avec OFFSET
+# after : curseur (valeur, id) de la dernière ligne de la page précédente, None pour la première page
+# min_value / max_value : filtre de plage sur la colonne de tri (servi par le même index)
+@timed('storage.get_page')
+def get_page(sort_by='id', descending=False, after=None, limit=50, min_value=None, max_value=None, path=None):
+    column = SORT_COLUMNS[sort_by]
+    conditions = []
+    params = []
+    if min_value is not None:
+        conditions.append(f"{column} >= ?")
+        params.append(min_value)
+    if max_value is not None:
+        conditions.append(f"{column} <= ?")
+        params.append(max_value)
+    operator = '<' if descending else '>'
+    order = 'DESC' if descending else 'ASC'
+    if column == 'id':
+        segments = [([f"id {operator} ?"], [after[1]]) if after is not None else ([], [])]
+    else:
+        # Les valeurs NULL (cellules vides, anciennes lignes sans horodatage) viennent en tête en ordre croissant
+        # et en fin en ordre décroissant. Une comparaison avec NULL n'étant jamais vraie, lignes NULL et
+        # non NULL sont lues par deux requêtes successives, chacune servie par l'index (colonne, id)
+        if after is None:
+            null_segment, value_segment = ([f"{column} IS NULL"], []), ([f"{column} IS NOT NULL"], [])
+        elif after[0] is None:
+            null_segment = ([f"{column} IS NULL", f"id {operator} ?"], [after[1]])
+            value_segment = None if descending else ([f"{column} IS NOT NULL"], [])
+        else:
+            null_segment = ([f"{column} IS NULL"], []) if descending else None
+            value_segment = ([f"({column}, id) {operator} (?, ?)"], list(after))
+        # Un filtre de plage exclut les valeurs NULL
+        if min_value is not None or max_value is not None:
+            null_segment = None
+        segments = [segment for segment in ((value_segment, null_segment) if descending
+                                            else (null_segment, value_segment)) if segment is not None]
+    order_by = f"id {order}" if column == 'id' else f"{column} {order}, id {order}"
+    rows = []
+    with connection(path) as conn:
+        for segment_conditions, segment_params in segments:
+            where = ' AND '.join(conditions + segment_conditions)
+            where = f" WHERE {where}" if where else ''
+            rows += conn.execute(
+                f"{SELECT_ALL_SQL}{where} ORDER BY {order_by} LIMIT ?", params + segment_params + [limit - len(rows)]
+            ).fetchall()
+            if len(rows) == limit:
+                break
+    page = _to_frame(rows)
+    next_cursor = None
+    if len(rows) == limit:
+        last = rows[-1]
+        next_cursor = (last[COLUMNS.index(sort_by)], last[0])
+    return page, next_cursor
+
+
+# Tranches de temps des KPI (libellé -> durée en secondes, origine en secondes depuis l'epoch)
+BUCKETS = {
+    'Équipe (8 h)': (8 * 3600, 6 * 3600),  # équipes 6h-14h, 14h-22h, 22h-6h (UTC)
+    'Jour': (86400, 0),
+    'Semaine': (7 * 86400, 4 * 86400),  # semaines du lundi (le 1er janvier 1970 était un jeudi)
+}
+BUCKET_COLUMNS = ['Début', 'Nombre de Lignes', 'Temps de Production', 'Nombre de Produits Fabriqués',
+                  'Temps d\'Arrêt', 'Nombre de Pannes']
+
+# Fonction pour calculer les sommes par tranche de temps directement dans SQLite (GROUP BY)
+def get_bucket_sums(bucket='Jour', start=None, end=None, path=None):
+    width, origin = BUCKETS[bucket]
+    conditions = ["horodatage IS NOT NULL"]
+    params = [origin, width, width, origin]
+    if start is not None:
+        conditions.append("horodatage >= ?")
+        params.append(to_epoch(start))
+    if end is not None:
+        conditions.append("horodatage < ?")
+        params.append(to_epoch(end))
+    with connection(path) as conn:
+        rows = conn.execute(
+            f'''SELECT ((horodatage - ?) / ?) * ? + ? AS debut, COUNT(*), TOTAL(temps_production),
+                      TOTAL(nombre_produits), TOTAL(temps_arret), TOTAL(nombre_pannes)
+               FROM production_data WHERE {' AND '.join(conditions)}
+               GROUP BY debut ORDER BY debut''', params
+        ).fetchall()
+    sums = pd.DataFrame(rows, columns=BUCKET_COLUMNS)
+    sums['Début'] = pd.to_datetime(sums['Début'], unit='s')
+    return sums.set_index('Début')
+
+# Fonction pour calculer les KPI par tranche de temps, éventuellement sur une fenêtre glissante de N tranches
+@timed('storage.get_windowed_kpis')
+def get_windowed_kpis(bucket='Jour', max_capacity=0, rolling=1, start=None, end=None, path=None):
+    sums = get_bucket_sums(bucket, start, end, path)
+    if rolling > 1 and not sums.empty:
+        # Les tranches sans données comptent dans la fenêtre : on complète la série avant de sommer
+        width = pd.Timedelta(seconds=BUCKETS[bucket][0])
+        sums = sums.reindex(pd.date_range(sums.index[0], sums.index[-1], freq=width), fill_value=0)
+        sums.index.name = 'Début'
+        sums = sums.rolling(rolling, min_periods=1).sum()
+    kpis = sums.copy()
+    kpis['Taux de Production'], kpis['MTBF'], kpis['MTTR'] = kpis_from_sums(
+        *(sums[column] for column in SUM_COLUMNS), max_capacity=max_capacity)
+    return kpis
+
+
+# Correspondance entre les en-têtes acceptés à l'import et l'ordre des colonnes de INSERT_SQL
+IMPORT_HEADERS = [
+    ('Temps de Production', 'temps_production'),
+    ('Nombre de Produits Fabriqués', 'nombre_produits'),
+    ('Temps d\'Arrêt', 'temps_arret'),
+    ('Nombre de Pannes', 'nombre_pannes'),
+]
+# En-têtes facultatifs pour la date de chaque ligne (sinon la ligne est horodatée à l'import)
+TIMESTAMP_HEADERS = ['Horodatage', 'horodatage', 'Date', 'date', 'ds']
+
+def _to_number(value):
+    if isinstance(value, str):
+        value = value.strip().replace(',', '.')
+        return float(value) if value else None
+    return value
+
+# Fonction pour trouver la position de chaque colonne à importer dans la ligne d'en-tête
+def _header_positions(header):
+    names = [str(name).strip() if name is not None else '' for name in header]
+    positions = []
+    for label, column in IMPORT_HEADERS:
+        if label in names:
+            positions.append(names.index(label))
+        elif column in names:
+            positions.append(names.index(column))
+        else:
+            raise ValueError(f"Colonne manquante dans le fichier importé : {label}")
+    timestamp = next((names.index(name) for name in TIMESTAMP_HEADERS if name in names), None)
+    return positions, timestamp
+
+# Fonction pour convertir une ligne brute en tuple prêt pour INSERT_SQL
+def _import_row(row, positions, timestamp, now):
+    values = tuple(_to_number(row[p]) if p < len(row) else None for p in positions)
+    if timestamp is None or timestamp >= len(row):
+        return values + (now,)
+    horodatage = to_epoch(row[timestamp])
+    return values + (now if horodatage is None else horodatage,)
+
+# Fonction pour lire un classeur Excel ligne par ligne (openpyxl en lecture seule, mémoire constante)
+def iter_excel_rows(file):
+    from openpyxl import load_workbook
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        positions, timestamp = _header_positions(header)
+        now = int(time.time())
+        for row in rows:
+            if row is None or all(value is None for value in row):
+                continue
+            yield _import_row(row, positions, timestamp, now)
+    finally:
+        workbook.close()
+
+# Fonction pour lire un fichier CSV ligne par ligne (séparateur détecté automatiquement)
+def iter_csv_rows(file, encoding='utf-8-sig'):
+    import csv
+    import io
+    opened = isinstance(file, (str, bytes)) or hasattr(file, '__fspath__')
+    text = open(file, newline='', encoding=encoding) if opened else io.TextIOWrapper(file, newline='', encoding=encoding)
+    try:
+        sample = text.read(4096)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(text, dialect)
+        header = next(reader, None)
+        if header is None:
+            return
+        positions, timestamp = _header_positions(header)
+        now = int(time.time())
+        for row in reader:
+            if not row:
+                continue
+            yield _import_row(row, positions, timestamp, now)
+    finally:
+        # Le fichier fourni par l'appelant (ex. upload Streamlit) ne doit pas être fermé
+        if opened:
+            text.close()
+        else:
+            text.detach()
+
+# Fonction pour estimer le nombre de lignes à importer (None si inconnu à l'avance)
+def count_import_rows(file, name):
+    if not name.lower().endswith('.xlsx'):
+        return None
+    from openpyxl import load_workbook
+    workbook = load_workbook(file, read_only=True)
+    try:
+        max_row = workbook.active.max_row
+    finally:
+        workbook.close()
+        if hasattr(file, 'seek'):
+            file.seek(0)
+    return max_row - 1 if max_row else None
+
+# Fonction pour importer un fichier Excel/CSV dans production_data par lots de taille fixe
+# progress(lignes_importées, total_estimé) est appelé après chaque lot
+@timed('storage.import_file')
+def import_file(file, name=None, batch_size=5000, progress=None, path=None):
+    name = name or getattr(file, 'name', None) or str(file)
+    rows = iter_excel_rows(file) if name.lower().endswith('.xlsx') else iter_csv_rows(file)
+    total = count_import_rows(file, name) if progress is not None else None
+    start = time.perf_counter()
+    count = 0
+    batch = []
+    with connection(path) as conn:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                with conn:
+                    conn.executemany(INSERT_SQL, batch)
+                count += len(batch)
+                batch = []
+                if progress is not None:
+                    progress(count, total)
+        if batch:
+            with conn:
+                conn.executemany(INSERT_SQL, batch)
+            count += len(batch)
+            if progress is not None:
+                progress(count, total)
+    return count, time.perf_counter() - start
+
+
+# Test de charge : plusieurs threads insèrent en parallèle dans une base temporaire
+if __name__ == '__main__':
+    import argparse
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Test de charge concurrent de la couche de stockage SQLite")
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--rows', type=int, default=20000, help="lignes insérées par thread")
+    parser.add_argument('--batch-size', type=int, default=500, help="0 pour un commit par ligne (add_data)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        errors = []
+
+        def worker(seed):
+            try:
+                # Quelques lignes sans temps de production (cellules vides d'un import) : le maximum doit être gardé
+                rows = ((None if i % 97 == 0 else 1.0 + (seed + i) % 8, 10 + i % 50, 0.5, i % 3)
+                        for i in range(args.rows))
+                if args.batch_size > 0:
+                    add_data_many(rows, batch_size=args.batch_size, path=path)
+                else:
+                    for row in rows:
+                        add_data(*row, path=path)
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        total = args.threads * args.rows
+        totals = get_totals(path)
+        print(f"{total} insertions, {args.threads} threads, lots de {args.batch_size}: "
+              f"{elapsed:.2f} s, {total / elapsed:,.0f} insertions/s")
+        mismatches = check_totals(path=path)
+        print(f"erreurs: {len(errors)}, lignes comptées: {totals['Nombre de Lignes']}, écarts de totaux: {mismatches}")
+
+        # Pagination par clé : toutes les lignes sont parcourues, dans les deux sens, y compris les valeurs NULL
+        pages_path = os.path.join(tmp, 'pages.db')
+        add_data_many([(None if i % 3 == 0 else float(i % 4), None if i % 4 == 0 else i % 5, 0.5, i % 2,
+                        None if i % 5 == 0 else 1_700_000_000 + i % 7) for i in range(25)], path=pages_path)
+        reference = get_data(pages_path)
+        paging_errors = []
+        for sort_by in SORT_COLUMNS:
+            for descending in (False, True):
+                ids, cursor = [], None
+                while True:
+                    page, cursor = get_page(sort_by, descending, after=cursor, limit=4, path=pages_path)
+                    ids += page['id'].tolist()
+                    if cursor is None:
+                        break
+                expected = reference.sort_values([sort_by, 'id'], ascending=not descending,
+                                                 na_position='last' if descending else 'first')['id'].tolist()
+                if ids != expected:
+                    paging_errors.append((sort_by, descending))
+        print(f"pagination : {len(reference)} lignes parcourues par colonne et par sens, erreurs : {paging_errors}")
+        print(f"connexions ouvertes pour {args.threads} threads : {_pools[path]._idle.qsize()} "
+              f"(pool limité à {POOL_SIZE})")
+        close_pool(pages_path)
+        close_pool(path)
+        if errors or totals['Nombre de Lignes'] != total or mismatches or paging_errors:
+            raise SystemExit(1)
@@ -1,59 +1,18 @@
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
-from sklearn.linear_model import LinearRegression
 import numpy as np
-from fbprophet import Prophet
-import sqlite3
-
-# Configuration de la base de données SQLite
-conn = sqlite3.connect('data.db')
-c = conn.cursor()
-c.execute('''CREATE TABLE IF NOT EXISTS production_data (
-                id INTEGER PRIMARY KEY,
-                temps_production REAL,
-                nombre_produits INTEGER,
-                temps_arret REAL,
-                nombre_pannes INTEGER)''')
-conn.commit()
-
-# Fonction pour ajouter des données à la base de données
-def add_data(temps_production, nombre_produits, temps_arret, nombre_pannes):
-    c.execute("INSERT INTO production_data (temps_production, nombre_produits, temps_arret, nombre_pannes) VALUES (?, ?, ?, ?)",
-              (temps_production, nombre_produits, temps_arret, nombre_pannes))
-    conn.commit()
-
-# Fonction pour récupérer les données de la base de données
-def get_data():
-    c.execute("SELECT * FROM production_data")
-    data = c.fetchall()
-    return pd.DataFrame(data, columns=['id', 'Temps de Production', 'Nombre de Produits Fabriqués', 'Temps d\'Arrêt', 'Nombre de Pannes'])
-
-# Fonction pour calculer les KPI
-def calculate_kpis(data, max_capacity):
-    total_time = data['Temps de Production'].sum()
-    total_production = data['Nombre de Produits Fabriqués'].sum()
-    total_downtime = data['Temps d\'Arrêt'].sum()
-    total_failures = data['Nombre de Pannes'].sum()
-
-    if total_time > 0 and max_capacity > 0:
-        production_rate = (total_production / total_time) / max_capacity * 100
-        mtbf = total_time / total_failures if total_failures > 0 else 0
-        mttr = total_downtime / total_failures if total_failures > 0 else 0
-    else:
-        production_rate = mtbf = mttr = 0
-
-    return production_rate, mtbf, mttr
-
-# Fonction de prévision avec Prophet
-def make_advanced_forecast(data):
-    data['ds'] = data.index
-    data['y'] = data['Nombre de Produits Fabriqués']
-    model = Prophet()
-    model.fit(data)
-    future = model.make_future_dataframe(periods=1)
-    forecast = model.predict(future)
-    return forecast.iloc[-1]['yhat']
+from gauges import gauge_panel
+from model_cache import forecast_cache
+from forecast_jobs import forecast_jobs, submit_advanced_forecast, DONE, FAILED
+from upload_cache import read_upload
+from kpi import calculate_kpis
+from profiling import profiler, section, profiling_panel
+# Couche de stockage SQLite (pool de connexions partagé, WAL, écritures par lots)
+from storage import (add_data, get_totals, get_page, check_totals, import_file, get_windowed_kpis,
+                     get_trend, get_trend_forecast, rebuild_trend, SORT_COLUMNS, BUCKETS)
+
+# Début de la mesure du rerun complet (seulement si le profilage est activé)
+rerun_started = profiler.start()
 
 # Interface utilisateur
 st.title("Application de suivi de performance et d'analyse prédictive")
@@ -77,13 +36,68 @@ if st.button("Ajouter"):
     else:
         st.error("Tous les champs doivent être remplis avec des valeurs positives.")
 
+# Import en masse de l'historique (Excel ou CSV, lu ligne par ligne et inséré par lots)
+st.header("Importer un historique")
+history_file = st.file_uploader("Choisissez un fichier Excel ou CSV à importer", type=["xlsx", "csv"], key="history_file")
+if history_file and st.button("Importer"):
+    progress_bar = st.progress(0.0)
+    progress_text = st.empty()
+
+    def show_progress(count, total):
+        if total:
+            progress_bar.progress(min(count / total, 1.0))
+        progress_text.write(f"{count} lignes importées...")
+
+    try:
+        count, elapsed = import_file(history_file, name=history_file.name, progress=show_progress)
+    except ValueError as error:
+        st.error(str(error))
+    else:
+        progress_bar.progress(1.0)
+        rate = count / elapsed if elapsed > 0 else 0
+        progress_text.write(f"{count} lignes importées en {elapsed:.2f} s ({rate:,.0f} lignes/s).")
+        st.success("Historique importé avec succès!")
+
 # Affichage des données et calcul des KPI
-data = get_data()
-if not data.empty:
+totals = get_totals()
+if totals['Nombre de Lignes'] > 0:
     st.header("Données de Production")
-    st.write(data)
 
-    production_rate, mtbf, mttr = calculate_kpis(data, max_capacity)
+    # Vue paginée : seule la page courante est lue et envoyée au navigateur
+    col_sort, col_order, col_size = st.columns(3)
+    sort_by = col_sort.selectbox("Trier par", list(SORT_COLUMNS))
+    descending = col_order.checkbox("Ordre décroissant", value=True)
+    page_size = col_size.selectbox("Lignes par page", [25, 50, 100, 500], index=1)
+    col_min, col_max = st.columns(2)
+    filter_min = col_min.text_input(f"{sort_by} minimum")
+    filter_max = col_max.text_input(f"{sort_by} maximum")
+    try:
+        min_value = float(filter_min.replace(',', '.')) if filter_min else None
+        max_value = float(filter_max.replace(',', '.')) if filter_max else None
+    except ValueError:
+        st.error("Les filtres doivent être des nombres.")
+        min_value = max_value = None
+
+    # Pile des curseurs des pages visitées, réinitialisée quand le tri ou le filtre change
+    view_key = (sort_by, descending, page_size, min_value, max_value)
+    if st.session_state.get('page_view') != view_key:
+        st.session_state['page_view'] = view_key
+        st.session_state['page_cursors'] = [None]
+    cursors = st.session_state['page_cursors']
+
+    col_prev, col_next = st.columns(2)
+    if col_prev.button("Page précédente") and len(cursors) > 1:
+        cursors.pop()
+    page, next_cursor = get_page(sort_by, descending, after=cursors[-1], limit=page_size,
+                                 min_value=min_value, max_value=max_value)
+    if col_next.button("Page suivante") and next_cursor is not None:
+        cursors.append(next_cursor)
+        page, next_cursor = get_page(sort_by, descending, after=cursors[-1], limit=page_size,
+                                     min_value=min_value, max_value=max_value)
+    st.write(page)
+    st.caption(f"Page {len(cursors)} — {totals['Nombre de Lignes']} lignes au total")
+
+    production_rate, mtbf, mttr = calculate_kpis(totals, max_capacity)
 
     # Affichage des résultats
     st.header("Résultats de Performance")
@@ -91,98 +105,115 @@ if not data.empty:
     st.write(f"**Temps Moyen Entre Pannes (MTBF):** {mtbf:.2f} heures")
     st.write(f"**Temps Moyen de Réparation (MTTR):** {mttr:.2f} heures")
 
+    # Prévision de tendance : statistiques mises à jour à chaque ajout (trigger SQLite), sans réentraînement
+    st.header("Prévision de Tendance")
+    # Mêmes bornes que rebuild_trend, ]0, 1], à la précision affichée (valeur enregistrée ramenée dans ces bornes)
+    forgetting = st.number_input("Facteur d'oubli (1 = tout l'historique)", min_value=0.001, max_value=1.0,
+                                 value=min(max(float(get_trend()['oubli']), 0.001), 1.0), step=0.001, format="%.3f")
+    if forgetting != get_trend()['oubli']:
+        rebuild_trend(forgetting)
+    trend_forecast, trend_lower, trend_upper = get_trend_forecast()
+    st.write(f"**Prévision du nombre de produits (prochain enregistrement):** {trend_forecast:.2f}")
+    if not np.isnan(trend_lower):
+        st.write(f"Intervalle de prédiction à 95 % : [{trend_lower:.2f}, {trend_upper:.2f}]")
+
     # Objectifs pour les KPI
     objective_production_rate = 100
-    objective_mtbf = data['Temps de Production'].max()  # Utilisation du temps de production maximum comme objectif
+    objective_mtbf = totals['Temps de Production Max']  # Utilisation du temps de production maximum comme objectif
     objective_mttr = 2  # Objectif pour le MTTR
 
     # Choisir les couleurs pour les graphiques
     color_choice = st.color_picker("Choisir une couleur pour les graphiques", "#00f900")
 
-    # Graphique Thermomètre pour le Taux de Production
-    st.header("Graphique Thermomètre pour le Taux de Production")
-    fig_production_rate = go.Figure()
-    fig_production_rate.add_trace(go.Indicator(
-        mode="gauge+number",
-        value=production_rate,
-        gauge=dict(
-            axis=dict(range=[0, objective_production_rate]),
-            bar=dict(color=color_choice),
-            steps=[
-                {"range": [0, production_rate], "color": "green"},
-                {"range": [production_rate, objective_production_rate], "color": "red"}
-            ],
-            threshold=dict(
-                line=dict(color="red", width=4),
-                thickness=0.75,
-                value=production_rate
-            )
-        ),
-        title={"text": "Taux de Production (%)"}
-    ))
-    st.plotly_chart(fig_production_rate)
-
-    # Graphique Thermomètre pour MTBF
-    st.header("Graphique Thermomètre pour le MTBF")
-    fig_mtbf = go.Figure()
-    fig_mtbf.add_trace(go.Indicator(
-        mode="gauge+number",
-        value=mtbf,
-        gauge=dict(
-            axis=dict(range=[0, objective_mtbf]),
-            bar=dict(color=color_choice),
-            steps=[
-                {"range": [0, mtbf], "color": "green"},
-                {"range": [mtbf, objective_mtbf], "color": "red"}
-            ],
-            threshold=dict(
-                line=dict(color="red", width=4),
-                thickness=0.75,
-                value=mtbf
-            )
-        ),
-        title={"text": "Temps Moyen Entre Pannes (MTBF)"}
-    ))
-    st.plotly_chart(fig_mtbf)
-
-    # Graphique Thermomètre pour MTTR
-    st.header("Graphique Thermomètre pour le MTTR")
-    fig_mttr = go.Figure()
-    fig_mttr.add_trace(go.Indicator(
-        mode="gauge+number",
-        value=mttr,
-        gauge=dict(
-            axis=dict(range=[0, objective_mttr]),
-            bar=dict(color=color_choice),
-            steps=[
-                {"range": [0, mttr], "color": "green"},
-                {"range": [mttr, 2], "color": "red"}
-            ],
-            threshold=dict(
-                line=dict(color="red", width=4),
-                thickness=0.75,
-                value=mttr
-            )
-        ),
-        title={"text": "Temps Moyen de Réparation (MTTR)"}
-    ))
-    st.plotly_chart(fig_mttr)
-
-    # Prévision
-    uploaded_file = st.file_uploader("Choisissez un fichier Excel pour faire une prévision", type="xlsx")
-    if uploaded_file:
-        data_forecast = pd.read_excel(uploaded_file)
-        if st.button("Prévoir avec Prophet"):
-            forecast = make_advanced_forecast(data_forecast)
-            st.write(f"La prévision du nombre de produits fabriqués est: {forecast:.2f}")
+    # Graphiques Thermomètres : les trois KPI dans une seule figure, mémorisée sur les valeurs et objectifs
+    st.header("Graphiques Thermomètres des KPI")
+    with section('test.plotly_chart'):
+        st.plotly_chart(gauge_panel(
+            (production_rate, mtbf, mttr),
+            (objective_production_rate, objective_mtbf, objective_mttr),
+            ("Taux de Production (%)", "Temps Moyen Entre Pannes (MTBF)", "Temps Moyen de Réparation (MTTR)"),
+            bar_color=color_choice,
+        ), width="stretch")
+
+    # Tendances des KPI par tranche de temps (agrégées dans SQLite)
+    st.header("Tendances des KPI")
+    col_bucket, col_window = st.columns(2)
+    bucket = col_bucket.selectbox("Regrouper par", list(BUCKETS), index=1)
+    rolling = col_window.number_input("Fenêtre glissante (nombre de tranches)", min_value=1, value=1)
+    trends = get_windowed_kpis(bucket, max_capacity, rolling=int(rolling))
+    if trends.empty:
+        st.write("Aucune donnée horodatée pour afficher les tendances.")
+    else:
+        with section('test.line_chart'):
+            st.line_chart(trends[['Taux de Production']])
+            st.line_chart(trends[['MTBF', 'MTTR']])
+
+    # Prévision (entraînements Prophet exécutés en parallèle dans un pool de processus)
+    uploaded_files = st.file_uploader("Choisissez un ou plusieurs fichiers Excel pour faire une prévision", type="xlsx",
+                                      accept_multiple_files=True)
+    job_ids = st.session_state.setdefault('forecast_job_ids', {})
+    if uploaded_files and st.button("Prévoir avec Prophet"):
+        for uploaded_file in uploaded_files:
+            data_forecast = read_upload(uploaded_file)
+            forecast, job_id = submit_advanced_forecast(data_forecast, uploaded_file.name)
+            if job_id is None:
+                st.session_state.setdefault('forecast_results', {})[uploaded_file.name] = forecast
+            else:
+                job_ids[uploaded_file.name] = job_id
+
+    # Suivi des travaux de la session : les résultats sont récupérés lors d'un rerun ultérieur
+    forecast_results = st.session_state.setdefault('forecast_results', {})
+    for name, job_id in list(job_ids.items()):
+        status = forecast_jobs.status(job_id)
+        if status == DONE:
+            forecast_results[name] = forecast_jobs.result(job_id)
+        elif status == FAILED:
+            st.error(f"La prévision de {name} a échoué : {forecast_jobs.result(job_id)}")
+        elif status is None:
+            st.warning(f"La prévision de {name} n'est plus disponible, relancez-la.")
+        else:
+            continue
+        # Résultat récupéré : le travail est retiré de la file partagée
+        forecast_jobs.forget(job_id)
+        del job_ids[name]
+    for name, forecast in forecast_results.items():
+        st.write(f"La prévision du nombre de produits fabriqués ({name}) est: {forecast:.2f}")
+    if job_ids:
+        st.subheader("Prévisions en cours")
+        for name, job_id in job_ids.items():
+            st.write(f"{name} : {forecast_jobs.status(job_id)}")
+        st.button("Actualiser")
 else:
     st.write("Aucune donnée disponible. Veuillez ajouter des données pour voir les résultats et les graphiques.")
 
+# Vérification de cohérence des totaux cumulés
+st.sidebar.header("Maintenance")
+if st.sidebar.button("Vérifier les totaux"):
+    mismatches = check_totals()
+    if mismatches:
+        st.sidebar.warning(f"Totaux reconstruits ({len(mismatches)} écart(s) corrigé(s)).")
+    else:
+        st.sidebar.success("Les totaux sont cohérents avec les données.")
+
+# Statistiques du cache des modèles de prévision
+st.sidebar.header("Cache des prévisions")
+st.sidebar.write(forecast_cache.stats())
+st.sidebar.header("Travaux de prévision")
+st.sidebar.write(f"{forecast_jobs.max_workers} processus au maximum")
+jobs_summary = forecast_jobs.jobs(st.session_state.get('forecast_job_ids', {}).values())
+if jobs_summary:
+    st.sidebar.dataframe(pd.DataFrame(jobs_summary).drop(columns='id'))
+
+# Panneau de profilage (temps par section, percentiles, export Prometheus)
+profiler.stop('test.rerun', rerun_started)
+profiling_panel(st.sidebar)
+
 # Documentation
 st.sidebar.header("Documentation")
 st.sidebar.write("""
 - **Entrée de Données** : Saisissez les données de production et de maintenance.
 - **Calcul des KPI** : Cliquez sur "Ajouter" pour calculer et afficher les KPI.
+- **Import** : Importez un historique Excel/CSV avec les colonnes de production et de maintenance.
 - **Prévisions** : Téléchargez un fichier Excel et cliquez sur "Prévoir" pour obtenir des prévisions.
 - **Exportation** : Utilisez les boutons d'exportation pour sauvegarder les données.
 """)
@@ -0,0 +1,156 @@
+import csv
+import hashlib
+import json
+import os
+import threading
+import pandas as pd
+import pyarrow as pa
+from profiling import section, timed
+
+# Répertoire et taille maximale (octets) des fichiers colonnes issus des classeurs téléchargés
+CACHE_DIR = os.environ.get('UPLOAD_CACHE_DIR', '.upload_cache')
+MAX_BYTES = int(os.environ.get('UPLOAD_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+_lock = threading.Lock()
+
+
+# Fonction pour calculer l'empreinte du contenu d'un fichier téléchargé (et des options de lecture)
+def upload_key(uploaded_file, **options):
+    if hasattr(uploaded_file, 'getvalue'):
+        content = uploaded_file.getvalue()
+    else:
+        content = uploaded_file.read()
+        uploaded_file.seek(0)
+    digest = hashlib.sha256(content)
+    digest.update(repr(sorted(options.items())).encode())
+    return digest.hexdigest()
+
+
+def _cache_path(key, cache_dir):
+    return os.path.join(cache_dir, f"{key}.arrow")
+
+
+# Fonction pour supprimer les fichiers les moins récemment utilisés au-delà de la taille maximale
+def _evict(cache_dir, max_bytes):
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith('.arrow'):
+            stat = os.stat(os.path.join(cache_dir, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(os.path.join(cache_dir, name))
+        total -= size
+
+
+# Fonction pour lire un fichier CSV (chemin ou fichier téléchargé) avec le lecteur C de pandas :
+# le séparateur est détecté sur la première ligne (le moteur Python de sep=None est bien plus lent)
+def read_csv(file):
+    if isinstance(file, (str, bytes)) or hasattr(file, '__fspath__'):
+        with open(file, 'rb') as handle:
+            first_line = handle.readline()
+    else:
+        first_line = file.readline()
+        file.seek(0)
+    if isinstance(first_line, bytes):
+        first_line = first_line.decode('utf-8-sig', errors='replace')
+    try:
+        sep = csv.Sniffer().sniff(first_line, delimiters=',;\t').delimiter
+    except csv.Error:
+        sep = ','
+    return pd.read_csv(file, sep=sep)
+
+
+# Fonction pour relire une table Arrow du cache (projetée en mémoire), ou None si elle est absente
+def _read_cached(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    except (OSError, pa.ArrowInvalid):
+        os.remove(path)
+        return None
+    os.utime(path)  # Marque l'entrée comme récemment utilisée pour l'éviction LRU
+    return table
+
+
+# Fonction pour écrire des tables Arrow dans le cache (écriture atomique), puis appliquer la taille maximale
+def _write_cached(tables, cache_dir, max_bytes):
+    with _lock:
+        os.makedirs(cache_dir, exist_ok=True)
+        for path, table in tables:
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with pa.OSFile(tmp_path, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp_path, path)
+        _evict(cache_dir, max_bytes)
+
+
+# Fonction pour lire un classeur téléchargé : analysé une seule fois, puis relu depuis un fichier
+# Arrow (format colonnes) projeté en mémoire lors des reruns suivants
+@timed('upload_cache.read_upload')
+def read_upload(uploaded_file, sheet_name=0, cache_dir=None, max_bytes=None):
+    cache_dir = cache_dir or CACHE_DIR
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    name = getattr(uploaded_file, 'name', '')
+    path = _cache_path(upload_key(uploaded_file, sheet_name=sheet_name), cache_dir)
+
+    table = _read_cached(path)
+    if table is not None:
+        return table.to_pandas()
+
+    with section('upload_cache.parse'):
+        if name.lower().endswith('.csv'):
+            data = read_csv(uploaded_file)
+        else:
+            data = pd.read_excel(uploaded_file, sheet_name=sheet_name)
+
+    # Les colonnes de types mélangés ne sont pas convertibles en Arrow : le résultat n'est alors pas mis en cache
+    try:
+        table = pa.Table.from_pandas(data)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return data
+    _write_cached([(path, table)], cache_dir, max_bytes)
+    return data
+
+
+# Fonction pour lire toutes les feuilles d'un classeur en une seule analyse ; renvoie un dictionnaire
+# nom de feuille -> DataFrame. Une empreinte pour tout le classeur, un fichier Arrow par feuille
+# (la liste des feuilles est gardée dans les métadonnées du premier) ; si l'un manque, tout est relu
+@timed('upload_cache.read_upload_sheets')
+def read_upload_sheets(uploaded_file, cache_dir=None, max_bytes=None):
+    cache_dir = cache_dir or CACHE_DIR
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    key = upload_key(uploaded_file, sheet_name=None)
+
+    first = _read_cached(_cache_path(f"{key}-0", cache_dir))
+    if first is not None:
+        names = json.loads(first.schema.metadata[b'sheets'])
+        tables = [first] + [_read_cached(_cache_path(f"{key}-{number}", cache_dir)) for number in range(1, len(names))]
+        if all(table is not None for table in tables):
+            return {name: table.to_pandas() for name, table in zip(names, tables)}
+
+    with section('upload_cache.parse'):
+        sheets = pd.read_excel(uploaded_file, sheet_name=None)
+
+    try:
+        tables = [pa.Table.from_pandas(data) for data in sheets.values()]
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return sheets
+    tables[0] = tables[0].replace_schema_metadata({**(tables[0].schema.metadata or {}),
+                                                   b'sheets': json.dumps(list(sheets)).encode()})
+    _write_cached([(_cache_path(f"{key}-{number}", cache_dir), table) for number, table in enumerate(tables)],
+                  cache_dir, max_bytes)
+    return sheets
+
+
+# Fonction pour connaître l'occupation disque du cache
+def cache_usage(cache_dir=None):
+    cache_dir = cache_dir or CACHE_DIR
+    if not os.path.isdir(cache_dir):
+        return {'Fichiers': 0, 'Octets': 0}
+    sizes = [os.path.getsize(os.path.join(cache_dir, name)) for name in os.listdir(cache_dir) if name.endswith('.arrow')]
+    return {'Fichiers': len(sizes), 'Octets': sum(sizes)}